@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: single-pass preprocess() vs. the previous regex chain.
+
+Usage
+-----
+    python benchmarks/bench_preprocess.py [--links N] [--repeat R]
+
+Times both implementations on generated link-heavy notes and prints
+the per-note time and the speedup.
+"""
+
+import re
+import sys
+import random
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from build_site import preprocess, slugify  # noqa: E402
+
+# ── previous implementation (three full-text passes, uncached slugify) ────────
+LEGACY_HIGHLIGHT_RE = re.compile(r'==(.+?)==')
+legacy_slugify = slugify.__wrapped__
+
+def legacy_preprocess(md:str) -> str:
+    md = LEGACY_HIGHLIGHT_RE.sub(lambda m:f"<mark>{m.group(1)}</mark>", md)
+    def embed(m):
+        inner=m.group(1).strip(); tgt, *alias=inner.split("|",1)
+        disp=alias[0] if alias else tgt; return f"![{disp}]({legacy_slugify(tgt)}.html)"
+    md = re.sub(r"!\[\[([^\]]+)\]\]", embed, md)
+    def link(m):
+        inner=m.group(1).strip(); tgt,*alias=inner.split("|",1)
+        disp=alias[0] if alias else tgt; return f"[{disp}]({legacy_slugify(tgt)}.html)"
+    md = re.sub(r"\[\[([^\]]+)\]\]", link, md)
+    return md
+
+# ── sample notes ──────────────────────────────────────────────────────────────
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor".split()
+
+def make_note(rng, links:int, targets:int=200) -> str:
+    """A note with `links` wikilinks spread over paragraphs, plus highlights and code"""
+    paragraphs = []
+    for i in range(max(1, links // 5)):
+        words = [rng.choice(WORDS) for _ in range(40)]
+        for _ in range(5):
+            target = f"Note {rng.randrange(targets)}"
+            words.insert(rng.randrange(len(words)), f"[[{target}|{target.lower()}]]" if rng.random() < .3 else f"[[{target}]]")
+        if i % 4 == 0:
+            words.append("==highlighted phrase==")
+        paragraphs.append(" ".join(words))
+        if i % 6 == 0:
+            paragraphs.append("```python\nprint('[[not a link]]')\n```")
+    return "\n\n".join(paragraphs)
+
+def main():
+    args = sys.argv[1:]
+    links = int(args[args.index("--links") + 1]) if "--links" in args else 200
+    repeat = int(args[args.index("--repeat") + 1]) if "--repeat" in args else 200
+
+    rng = random.Random(42)
+    notes = [make_note(rng, links) for _ in range(20)]
+
+    def run(func):
+        return min(timeit.repeat(lambda: [func(note) for note in notes], number=repeat // 20 or 1, repeat=5))
+
+    legacy = run(legacy_preprocess)
+    current = run(preprocess)
+    per_note = lambda t: t / ((repeat // 20 or 1) * len(notes)) * 1e6
+    print(f"links/note: {links}")
+    print(f"legacy regex chain : {per_note(legacy):8.1f} µs/note")
+    print(f"single-pass scan   : {per_note(current):8.1f} µs/note")
+    print(f"speedup            : {legacy / current:8.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Check what --fingerprint renames.
+
+Usage
+-----
+    python benchmarks/check_fingerprint.py
+
+Builds a small vault with ``--fingerprint`` and checks that the files hosts,
+browsers and crawlers fetch by a fixed name (``CNAME``, ``favicon.ico``,
+``robots.txt`` and the like) keep their names, while style.css and the
+assets pages embed are renamed and every reference points at the new name.
+Exits with status 1 on any failure.
+"""
+
+import re
+import sys
+import json
+import tempfile
+import subprocess
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+BUILD = [sys.executable, str(REPO / "build_site.py")]
+
+FIXED_FILES = ["CNAME", "favicon.ico", "robots.txt", "sitemap.xml", ".well-known/security.txt"]
+RENAMED_FILES = ["style.css", "images/photo.png"]
+URL_RE = re.compile(r"""\b(?:href|src)=["']([^"']*)""")
+
+
+def make_vault(root:Path) -> Path:
+    vault = root / "Fingerprints"
+    (vault / "images").mkdir(parents=True)
+    (vault / ".well-known").mkdir()
+    (vault / "Fingerprints.md").write_text("# Home\n\n![[photo.png]]\n", encoding="utf-8")
+    (vault / "Page.md").write_text("# Page\n\n![[images/photo.png]]\n", encoding="utf-8")
+    (vault / "images" / "photo.png").write_bytes(b"\x89PNG\r\n\x1a\nnot really a photo")
+    for rel in FIXED_FILES:
+        (vault / rel).write_text(f"fixed name: {rel}\n", encoding="utf-8")
+    return vault
+
+
+def main():
+    failures = []
+    with tempfile.TemporaryDirectory(prefix="ssg-fingerprint-") as tmp:
+        tmp = Path(tmp)
+        out = tmp / "out"
+        subprocess.run(BUILD + [str(make_vault(tmp)), str(out), "--fingerprint", "--no-cache"], check=True,
+                       stdout=subprocess.DEVNULL)
+        manifest = json.loads((out / "asset-manifest.json").read_text(encoding="utf-8"))
+
+        for rel in FIXED_FILES:
+            if rel in manifest or not (out / rel).is_file():
+                failures.append(f"{rel} was renamed")
+        for rel in RENAMED_FILES:
+            renamed = manifest.get(rel)
+            if renamed is None or not (out / renamed).is_file() or (out / rel).exists():
+                failures.append(f"{rel} was not renamed")
+        urls = {url for path in out.rglob("*.html") for url in URL_RE.findall(path.read_text(encoding="utf-8"))}
+        for rel in RENAMED_FILES:
+            if any(url.rsplit("/", 1)[-1] == Path(rel).name for url in urls):
+                failures.append(f"a page still references {rel}")
+
+    for failure in failures:
+        print(f"✗ {failure}")
+    if failures:
+        sys.exit(1)
+    print("✓ Fixed-name files keep their names; style.css and embedded assets are fingerprinted")
+
+
+if __name__ == "__main__":
+    main()
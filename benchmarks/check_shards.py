@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Check that a sharded build matches a single-process build.
+
+Usage
+-----
+    python benchmarks/check_shards.py [vault_dir] [--shards N] [--notes N] [build options]
+
+Builds the vault (a synthetic one with --notes notes when no vault is given)
+once normally and once as N parallel `--shard i/N` processes, merges the
+shards, and compares the two output trees file by file. Exits with status 1
+on any difference and prints the time each approach took.
+"""
+
+import sys
+import time
+import filecmp
+import tempfile
+import subprocess
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+from synthetic_vault import generate_vault  # noqa: E402
+
+BUILD = [sys.executable, str(REPO / "build_site.py")]
+
+
+def differences(a:Path, b:Path):
+    """Yield relative paths that differ between two directory trees"""
+    files_a = {p.relative_to(a).as_posix() for p in a.rglob("*") if p.is_file()}
+    files_b = {p.relative_to(b).as_posix() for p in b.rglob("*") if p.is_file()}
+    yield from sorted(files_a ^ files_b)
+    for rel in sorted(files_a & files_b):
+        if not filecmp.cmp(a / rel, b / rel, shallow=False):
+            yield rel
+
+
+def main():
+    args = sys.argv[1:]
+
+    def option(name, default, convert):
+        if name not in args:
+            return default
+        i = args.index(name)
+        value = convert(args[i + 1])
+        del args[i:i + 2]
+        return value
+
+    shards = option("--shards", 4, int)
+    notes = option("--notes", 500, int)
+    vault = Path(args.pop(0)) if args and not args[0].startswith("--") else None
+    build_options = args + ["--no-cache"]
+
+    with tempfile.TemporaryDirectory(prefix="ssg-shards-") as tmp:
+        tmp = Path(tmp)
+        if vault is None:
+            vault = generate_vault(tmp / "Vault", notes=notes)
+
+        started = time.perf_counter()
+        subprocess.run(BUILD + [str(vault), str(tmp / "single")] + build_options, check=True, stdout=subprocess.DEVNULL)
+        single = time.perf_counter() - started
+
+        started = time.perf_counter()
+        shard_dirs = [tmp / f"shard-{i}" for i in range(1, shards + 1)]
+        processes = [subprocess.Popen(BUILD + [str(vault), str(shard_dir), "--shard", f"{i}/{shards}"] + build_options,
+                                      stdout=subprocess.DEVNULL)
+                     for i, shard_dir in enumerate(shard_dirs, 1)]
+        if any([process.wait() for process in processes]):
+            print("✗ A shard build failed")
+            sys.exit(1)
+        merge_options = [arg for arg in build_options if arg == "--deploy-manifest"]
+        subprocess.run(BUILD + ["merge", str(tmp / "merged")] + list(map(str, shard_dirs)) + merge_options, check=True,
+                       stdout=subprocess.DEVNULL)
+        sharded = time.perf_counter() - started
+
+        different = list(differences(tmp / "single", tmp / "merged"))
+        print(f"   single process {single * 1000:10.1f} ms")
+        print(f"   {shards} shards + merge {sharded * 1000:8.1f} ms")
+        if different:
+            print(f"✗ {len(different)} file(s) differ, e.g. {different[0]}")
+            sys.exit(1)
+        print("✓ Merged shards match the single-process build")
+
+
+if __name__ == "__main__":
+    main()
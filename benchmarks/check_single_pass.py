@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Check that the single-pass build matches the two-pass build it replaced.
+
+Usage
+-----
+    python benchmarks/check_single_pass.py [vault_dir ...]
+
+The old build converted every note twice: once to read its title from
+``md.Meta`` after the original regex preprocessor, and again to write the
+page. ``build_notes`` reads every note once and takes the title from the
+raw front matter (``scan_meta``). The title is the only thing the first
+pass handed to the second, so this script:
+
+  * compares, note by note, the titles ``build_notes`` uses with the ones a
+    frozen copy of the original first pass (``baseline_title``) reads, and
+  * builds each vault twice, once with ``build_notes`` and once reading
+    every note again and rendering it with the baseline titles, and compares
+    the output trees file by file.
+
+Without arguments it checks the Demo Site, a vault of front matter edge cases
+and a vault of titles with markup. Markup in a title is the one intended
+change: ``==highlight==`` and ``[[links]]`` in ``title:`` used to be
+rewritten to ``<mark>`` HTML and Markdown links, and are now kept as written.
+TITLE_CHANGES lists those titles; any other difference fails with status 1.
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+from build_site import (build_notes, write_index, scan_vault, read_note, link_index, resolve_note,  # noqa: E402
+                        index_pages, navigation_by_depth, new_transcluder, render_note, new_markdown,
+                        page_depth, write_page)
+from site_output import OutputWriter  # noqa: E402
+from check_shards import differences  # noqa: E402
+from bench_preprocess import legacy_preprocess  # noqa: E402  (the original regex preprocessor)
+
+# Front matter the title scan has to read exactly as Markdown's meta extension does
+EDGE_CASES = {
+    "No Meta.md": "# No front matter\n\nThe title is the file name.\n",
+    "Override.md": "title: A Different Title\ntags: demo\n\nLinks to [[Multi Line]] and [[A Different Title]].\n",
+    "Multi Line.md": "Title: First line\n    second line\n\tthird line\nsummary: one\n  two\n\nBody with [[No Meta]].\n",
+    "Dashes.md": "---\ntitle: Between Dashes\nauthor: Someone\n---\n\n# Heading\n\nBody.\n",
+    "Dots.md": "---\ntitle: Ended By Dots\n...\nnot: meta\n",
+    "Empty Title.md": "title:\n\nAn empty value.\n",
+    "Not Meta.md": "Just a first line: with a colon\n\nThe colon is not front matter after a blank line.\n",
+    "Late Meta.md": "\ntitle: Too Late\n\nA blank first line means no front matter.\n",
+    "Body Markup.md": "title: Plain\n\n==Highlighted== body with [[Override]].\n",
+    "Sub/Sub.md": "title: Section Index\n\nA directory index with [[Dashes]].\n",
+    "Sub/_Hidden.md": "title: Hidden\n\nLeft out of the navigation.\n",
+}
+
+# Titles with markup: note → (title the two-pass build used, title used now)
+TITLE_CHANGES = {
+    "Marked.md": ("A <mark>marked</mark> title", "A ==marked== title"),
+    "Linked.md": ("About [Marked](marked.html)", "About [[Marked]]"),
+    "Aliased.md": ("See [the other](linked.html) one", "See [[Linked|the other]] one"),
+}
+TITLE_MARKUP = {
+    "Marked.md": "title: A ==marked== title\n\nBody.\n",
+    "Linked.md": "title: About [[Marked]]\n\nBody.\n",
+    "Aliased.md": "title: See [[Linked|the other]] one\n\nBody.\n",
+}
+
+_baseline_md = None
+
+
+def baseline_title(file:Path) -> str:
+    """Return a note's title the way the two-pass build's first pass read it (frozen copy)"""
+    global _baseline_md
+    if _baseline_md is None:
+        import markdown
+        _baseline_md = markdown.Markdown(
+            extensions=["toc", "footnotes", "tables", "fenced_code", "codehilite", "meta"],
+            extension_configs={"codehilite": {"guess_lang": False}},
+            output_format="html5",
+        )
+    raw = file.read_text(encoding="utf-8")
+    _baseline_md.convert(legacy_preprocess(raw))
+    title = _baseline_md.Meta.get("title", [file.stem])[0] if hasattr(_baseline_md, "Meta") else file.stem
+    _baseline_md.reset()
+    return title
+
+
+def write_vault(root:Path, name:str, notes) -> Path:
+    vault = root / name
+    for rel, text in notes.items():
+        (vault / rel).parent.mkdir(parents=True, exist_ok=True)
+        (vault / rel).write_text(text, encoding="utf-8")
+    return vault
+
+
+def title_differences(vault:Path):
+    """Yield (note, baseline title, current title) for every note whose title changed"""
+    for file in scan_vault(vault).notes():
+        old, new = baseline_title(file), read_note(vault, file)[0]
+        if old != new:
+            yield file.relative_to(vault).as_posix(), old, new
+
+
+def two_pass_build(vault:Path, out:Path):
+    """Build with the baseline titles, reading and rendering every note again in a second pass"""
+    out = OutputWriter(out)
+    snapshot = scan_vault(vault)
+    # First pass: only the titles are kept
+    notes = [(baseline_title(file),) + read_note(vault, file)[1:] for file in snapshot.notes()]
+
+    index = link_index(vault, notes, snapshot)
+    pages, vault_index_file = index_pages(notes)
+    nav_by_depth = navigation_by_depth(pages, vault_index_file)
+    embeds = new_transcluder(vault, index)
+    md = new_markdown()
+    # Second pass: read every note again and render it
+    for note in notes:
+        note = resolve_note(note[:5] + (note[4].read_text(encoding="utf-8"),), index)
+        html, meta, seconds, highlight_seconds = render_note(md, note[5])
+        html, _ = embeds.expand(html, page_depth(note[1]), note[4])
+        write_page(out, note, html, nav_by_depth)
+    write_index(pages, vault_index_file, out)
+
+
+def single_pass_build(vault:Path, out:Path):
+    pages, vault_index_file, _ = build_notes(vault, out)
+    write_index(pages, vault_index_file, out)
+
+
+def check_vault(vault:Path, tmp:Path, expected_titles) -> bool:
+    titles = {note: (old, new) for note, old, new in title_differences(vault)}
+    ok = True
+    for note, (old, new) in sorted(titles.items()):
+        if expected_titles.get(note) != (old, new):
+            print(f"✗ {vault.name}/{note}: title was {old!r}, is now {new!r}")
+            ok = False
+    for note in sorted(set(expected_titles) - set(titles)):
+        print(f"✗ {vault.name}/{note}: expected the title to change to {expected_titles[note][1]!r}")
+        ok = False
+    if expected_titles:
+        # Pages differ wherever the changed titles show up; the titles were compared above
+        if ok:
+            print(f"✓ {vault.name}: only the documented title changes, {len(titles)} note(s)")
+        return ok
+
+    two_pass, single_pass = tmp / f"{vault.name}-two-pass", tmp / f"{vault.name}-single-pass"
+    two_pass_build(vault, two_pass)
+    single_pass_build(vault, single_pass)
+    different = list(differences(two_pass, single_pass))
+    if different:
+        print(f"✗ {vault.name}: {len(different)} file(s) differ, e.g. {different[0]}")
+        return False
+    if ok:
+        print(f"✓ {vault.name}: the single-pass build matches the two-pass build")
+    return ok
+
+
+def main():
+    with tempfile.TemporaryDirectory(prefix="ssg-single-pass-") as tmp:
+        tmp = Path(tmp)
+        if sys.argv[1:]:
+            checks = [(Path(arg), {}) for arg in sys.argv[1:]]
+        else:
+            checks = [(REPO / "Demo Site", {}), (write_vault(tmp, "Edge Cases", EDGE_CASES), {}),
+                      (write_vault(tmp, "Title Markup", TITLE_MARKUP), TITLE_CHANGES)]
+        results = [check_vault(vault, tmp, expected) for vault, expected in checks]
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Check that the command line tools start without their heavy dependencies.
+
+Usage
+-----
+    python benchmarks/check_startup.py [--repeat R] [--max-import-ms MS]
+
+Imports build_site and serve in fresh interpreters and fails if Markdown,
+Pygments, watchdog or the process pool are imported up front; they are only
+needed once a build renders something or the dev server starts watching.
+Also prints the import time of each module (from ``python -X importtime``)
+and the wall time of ``build_site.py`` without arguments, and fails if an
+import takes longer than --max-import-ms.
+"""
+
+import sys
+import time
+import subprocess
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+DEFERRED_MODULES = ["markdown", "pygments", "watchdog", "concurrent.futures.process"]
+
+
+def loaded_modules(module:str):
+    """Return the deferred modules that importing `module` loads"""
+    code = (f"import sys; sys.path.insert(0, {str(REPO)!r}); import {module}; "
+            f"print(' '.join(name for name in {DEFERRED_MODULES!r} if name in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+    return result.stdout.split()
+
+
+def import_ms(module:str, repeat:int) -> float:
+    """Return the best cumulative import time of `module` in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=REPO,
+                                check=True, capture_output=True, text=True)
+        for line in result.stderr.splitlines():
+            fields = [field.strip() for field in line.split("|")]
+            if len(fields) == 3 and fields[2] == module:
+                best = min(best, int(fields[1]) / 1000)
+    return best
+
+
+def run_ms(args, repeat:int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=REPO, stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    args = sys.argv[1:]
+    repeat = int(args[args.index("--repeat") + 1]) if "--repeat" in args else 5
+    max_import_ms = float(args[args.index("--max-import-ms") + 1]) if "--max-import-ms" in args else None
+
+    failed = False
+    for module in ["build_site", "serve"]:
+        eager = loaded_modules(module)
+        milliseconds = import_ms(module, repeat)
+        print(f"   import {module:<12} {milliseconds:8.1f} ms")
+        if eager:
+            print(f"✗ import {module} loads {', '.join(eager)}")
+            failed = True
+        if max_import_ms is not None and milliseconds > max_import_ms:
+            print(f"✗ import {module} took more than {max_import_ms:g} ms")
+            failed = True
+    print(f"   build_site.py (usage)  {run_ms(['build_site.py'], repeat):8.1f} ms")
+    print(f"   python -c pass         {run_ms(['-c', 'pass'], repeat):8.1f} ms")
+
+    if failed:
+        sys.exit(1)
+    print("✓ Heavy imports are deferred until first use")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for build_site.py.
+
+Usage
+-----
+    python benchmarks/run_benchmarks.py run [--sizes 100,1000,10000,50000]
+        [--output results.json] [--links L] [--depth D] [--code-fraction F]
+        [--attachments KB,KB,...] [--repeat R]
+    python benchmarks/run_benchmarks.py compare <baseline.json> <results.json>
+        [--threshold 0.10]
+
+`run` generates a synthetic vault for every size (see synthetic_vault.py)
+and times scan_vault, preprocess, slugify, generate_navigation,
+build_notes, copy_assets and a full `build_site.py` run. The results are written as
+JSON.
+
+`compare` flags every stage that got slower than the baseline by more
+than the threshold, and exits with status 1 if there is any regression.
+"""
+
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+from build_site import (preprocess, slugify, scan_vault, collect_notes, generate_navigation, build_notes,  # noqa: E402
+                        copy_assets)
+from synthetic_vault import generate_vault  # noqa: E402
+
+DEFAULT_SIZES = [100, 1000]
+
+
+def best_of(func, repeat):
+    """Return the fastest wall time of `repeat` calls to func"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def bench_size(size, workdir:Path, vault_options, repeat):
+    vault = generate_vault(workdir / f"Vault {size}", notes=size, **vault_options)
+    sources = [path.read_text(encoding="utf-8") for path in sorted(vault.rglob("*.md"))]
+    targets = [f"Note {i}" for i in range(size)]
+    pages, vault_index_file, notes, link_index = collect_notes(vault)
+    out = workdir / f"out-{size}"
+
+    def fresh_output():
+        shutil.rmtree(out, ignore_errors=True)
+        out.mkdir()
+
+    def timed_build(func):
+        fresh_output()
+        return best_of(func, 1)
+
+    def full_run():
+        shutil.rmtree(out, ignore_errors=True)
+        subprocess.run([sys.executable, str(REPO / "build_site.py"), str(vault), str(out), "--no-cache"],
+                       check=True, stdout=subprocess.DEVNULL)
+
+    # Micro stages repeat; whole builds run once per size
+    return {
+        "scan_vault": best_of(lambda: scan_vault(vault), repeat),
+        "preprocess": best_of(lambda: [preprocess(text, index=link_index) for text in sources], repeat),
+        "slugify": best_of(lambda: [slugify.__wrapped__(title) for title in targets], repeat),
+        "generate_navigation": best_of(lambda: generate_navigation(pages, vault_index_file, 1), repeat),
+        "build_notes": timed_build(lambda: build_notes(vault, out)),
+        "copy_assets": timed_build(lambda: copy_assets(vault, out)),
+        "full_run": best_of(full_run, 1),
+    }
+
+
+def run(args):
+    def option(name, default, convert):
+        return convert(args[args.index(name) + 1]) if name in args else default
+
+    sizes = option("--sizes", DEFAULT_SIZES, lambda v: [int(size) for size in v.split(",")])
+    output = option("--output", "benchmark-results.json", str)
+    repeat = option("--repeat", 3, int)
+    vault_options = {
+        "depth": option("--depth", 2, int),
+        "links": option("--links", 5, int),
+        "code_fraction": option("--code-fraction", 0.2, float),
+        "attachments": option("--attachments", [64, 1024], lambda v: [float(kb) for kb in v.split(",") if kb]),
+    }
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="ssg-bench-") as tmp:
+        for size in sizes:
+            print(f"⏱  {size} notes...")
+            results[str(size)] = bench_size(size, Path(tmp), vault_options, repeat)
+            for stage, seconds in results[str(size)].items():
+                print(f"   {stage:<20} {seconds * 1000:10.1f} ms")
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "vault": vault_options,
+        "results": results,
+    }
+    Path(output).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(f"✓ Results written to {output}")
+
+
+def compare(args):
+    if len(args) < 2:
+        print(__doc__)
+        sys.exit(1)
+    threshold = float(args[args.index("--threshold") + 1]) if "--threshold" in args else 0.10
+    baseline = json.loads(Path(args[0]).read_text(encoding="utf-8"))["results"]
+    current = json.loads(Path(args[1]).read_text(encoding="utf-8"))["results"]
+
+    regressions = 0
+    for size in sorted(set(baseline) & set(current), key=int):
+        for stage in baseline[size]:
+            if stage not in current[size]:
+                continue
+            before, after = baseline[size][stage], current[size][stage]
+            change = (after - before) / before if before else 0.0
+            flag = "REGRESSION" if change > threshold else ""
+            regressions += bool(flag)
+            print(f"{size:>7} {stage:<20} {before * 1000:10.1f} ms → {after * 1000:10.1f} ms  {change:+7.1%}  {flag}")
+
+    if regressions:
+        print(f"✗ {regressions} regression(s) above {threshold:.0%}")
+        sys.exit(1)
+    print(f"✓ No regressions above {threshold:.0%}")
+
+
+def main():
+    args = sys.argv[1:]
+    if args[:1] == ["run"]:
+        run(args[1:])
+    elif args[:1] == ["compare"]:
+        compare(args[1:])
+    else:
+        print(__doc__)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic Obsidian vault generator for benchmarks.
+
+Usage
+-----
+    python benchmarks/synthetic_vault.py <output_dir> [--notes N] [--depth D]
+        [--links L] [--code-fraction F] [--attachments KB,KB,...] [--seed S]
+
+The same arguments always produce byte-identical vaults.
+"""
+
+import sys
+import random
+import shutil
+from pathlib import Path
+
+WORDS = ("the quick brown fox jumps over lazy dog markdown static site vault note "
+         "garden index link graph theme render build page section").split()
+LANGUAGES = ["python", "javascript", "bash", "rust", ""]
+
+
+def _sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _code_block(rng):
+    lang = rng.choice(LANGUAGES)
+    body = "\n".join(f"value_{i} = compute({rng.randrange(1000)})  # {rng.choice(WORDS)}" for i in range(rng.randint(3, 15)))
+    return f"```{lang}\n{body}\n```"
+
+
+def generate_vault(root, notes=100, depth=2, links=5, code_fraction=0.2, attachments=(), seed=0):
+    """Write a synthetic vault to `root` and return its path.
+
+    notes          number of markdown notes
+    depth          maximum directory nesting below the vault root
+    links          average wikilinks per note
+    code_fraction  fraction of paragraphs that are fenced code blocks
+    attachments    sizes in KB of binary attachments to put in Resources/
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    if root.exists():
+        shutil.rmtree(root)
+    root.mkdir(parents=True)
+
+    # Directory tree: a handful of sections, some nested up to `depth`
+    dirs = [Path(".")]
+    for i in range(max(1, notes // 50)):
+        parent = rng.choice([d for d in dirs if len(d.parts) < depth] or [Path(".")])
+        dirs.append(parent / f"Section {i}")
+
+    titles = [f"Note {i}" for i in range(notes)]
+    titles[0] = root.name  # vault index note
+
+    for i, title in enumerate(titles):
+        directory = Path(".") if i == 0 else rng.choice(dirs)
+        paragraphs = []
+        if rng.random() < 0.5:
+            paragraphs.append(f"title: {title} ({rng.choice(WORDS)})")
+        paragraphs.append(f"# {title}")
+        for _ in range(rng.randint(3, 12)):
+            if rng.random() < code_fraction:
+                paragraphs.append(_code_block(rng))
+                continue
+            sentences = [_sentence(rng) for _ in range(rng.randint(2, 6))]
+            for _ in range(rng.randint(0, 2 * links) // 3):
+                target = rng.choice(titles)
+                sentences.insert(rng.randrange(len(sentences) + 1),
+                                 f"[[{target}|{target.lower()}]]" if rng.random() < 0.3 else f"[[{target}]]")
+            if rng.random() < 0.2:
+                sentences.append(f"=={rng.choice(WORDS)} {rng.choice(WORDS)}==")
+            paragraphs.append(" ".join(sentences))
+
+        path = root / directory / f"{title}.md"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("\n\n".join(paragraphs) + "\n", encoding="utf-8")
+
+    resources = root / "Resources"
+    resources.mkdir(exist_ok=True)
+    for i, size_kb in enumerate(attachments):
+        (resources / f"attachment-{i}.bin").write_bytes(rng.randbytes(int(size_kb * 1024)))
+
+    return root
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0].startswith("--"):
+        print(__doc__)
+        sys.exit(1)
+
+    def option(name, default, convert):
+        return convert(args[args.index(name) + 1]) if name in args else default
+
+    root = generate_vault(
+        args[0],
+        notes=option("--notes", 100, int),
+        depth=option("--depth", 2, int),
+        links=option("--links", 5, int),
+        code_fraction=option("--code-fraction", 0.2, float),
+        attachments=option("--attachments", (), lambda v: [float(kb) for kb in v.split(",") if kb]),
+        seed=option("--seed", 0, int),
+    )
+    print(f"✓ Synthetic vault written to {root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Warm build daemon.
+
+``python build_site.py daemon`` starts a long-lived process that has already
+imported Markdown and Pygments, and keeps its code highlighting caches in
+memory. It listens on a Unix socket. ``build_site.py ... --daemon`` sends its
+command line to the daemon instead of building itself, prints the daemon's
+output and exits with the daemon's status. If no daemon is listening, the
+build runs in-process as usual. The daemon runs one build at a time.
+
+Protocol: the client sends one JSON line ``{"argv": [...], "cwd": "..."}``.
+The daemon answers with JSON lines ``{"out": text}`` and ``{"err": text}``,
+and ends with ``{"exit": status}``.
+
+Both sides only use a socket that the current user owns, as the default
+path may be in the shared /tmp.
+"""
+
+import io
+import os
+import sys
+import json
+import stat
+import signal
+import socket
+import traceback
+import contextlib
+
+
+def default_socket_path() -> str:
+    """Return the per-user socket path used when --daemon-socket isn't given"""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+    user = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "user")
+    return os.path.join(runtime_dir, f"ssg-build-daemon-{user}.sock")
+
+
+def _check_owner(socket_path:str):
+    """Raise PermissionError unless `socket_path` is a socket owned by this user.
+
+    Without XDG_RUNTIME_DIR the socket lives in /tmp, where another user could
+    create it first and read the command lines sent to it.
+    """
+    st = os.lstat(socket_path)
+    if not stat.S_ISSOCK(st.st_mode) or (hasattr(os, "getuid") and st.st_uid != os.getuid()):
+        raise PermissionError(f"{socket_path} is not a socket owned by this user")
+
+
+def _connect(socket_path:str):
+    _check_owner(socket_path)
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError:
+        client.close()
+        raise
+    return client
+
+
+# ── client ────────────────────────────────────────────────────────────────────
+def run_in_daemon(socket_path:str, argv, cwd:str):
+    """Run a build_site.py command line in the daemon and relay its output.
+
+    Returns the command's exit status, or None if no daemon is listening.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    try:
+        client = _connect(socket_path)
+    except PermissionError as e:
+        print(f"✗ Not using the build daemon: {e}", file=sys.stderr)
+        return None
+    except OSError:
+        return None
+    with client, client.makefile("rwb") as stream:
+        stream.write((json.dumps({"argv": list(argv), "cwd": cwd}) + "\n").encode("utf-8"))
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if "out" in message:
+                sys.stdout.write(message["out"])
+                sys.stdout.flush()
+            elif "err" in message:
+                sys.stderr.write(message["err"])
+                sys.stderr.flush()
+            elif "exit" in message:
+                return message["exit"]
+    print("✗ Build daemon closed the connection", file=sys.stderr)
+    return 1
+
+
+# ── daemon ────────────────────────────────────────────────────────────────────
+class _RelayStream(io.TextIOBase):
+    """A text stream that forwards writes to the client as JSON lines"""
+
+    def __init__(self, stream, key:str):
+        self.stream = stream
+        self.key = key
+        self.closed_by_client = False
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        if text and not self.closed_by_client:
+            try:
+                self.stream.write((json.dumps({self.key: text}) + "\n").encode("utf-8"))
+                self.stream.flush()
+            except OSError:
+                # The client went away; finish the build without output
+                self.closed_by_client = True
+        return len(text)
+
+
+def _exit_status(code) -> int:
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _handle(connection, run):
+    with connection.makefile("rwb") as stream:
+        try:
+            request = json.loads(stream.readline())
+            argv, cwd = request["argv"], request["cwd"]
+        except (ValueError, KeyError, TypeError):
+            return
+        out, err = _RelayStream(stream, "out"), _RelayStream(stream, "err")
+        previous_cwd = os.getcwd()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            try:
+                os.chdir(cwd)
+                run(argv)
+                status = 0
+            except SystemExit as e:
+                status = _exit_status(e.code)
+            except Exception:
+                traceback.print_exc()
+                status = 1
+            finally:
+                os.chdir(previous_cwd)
+        out.write("")
+        try:
+            stream.write((json.dumps({"exit": status}) + "\n").encode("utf-8"))
+            stream.flush()
+        except OSError:
+            pass
+
+
+def serve_daemon(socket_path:str, run) -> bool:
+    """Serve build requests on `socket_path` until interrupted.
+
+    `run(argv)` performs one build. Returns False if the socket is already
+    served by another daemon.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        print("✗ The build daemon needs Unix domain sockets, which this platform lacks")
+        return False
+    if os.path.lexists(socket_path):
+        try:
+            _connect(socket_path).close()
+            print(f"✗ A build daemon is already listening on {socket_path}")
+            return False
+        except PermissionError as e:
+            print(f"✗ {e}")
+            return False
+        except OSError:
+            os.unlink(socket_path)  # Left behind by a daemon that didn't shut down cleanly
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o077)  # Only this user may connect
+    try:
+        server.bind(socket_path)
+    finally:
+        os.umask(umask)
+    server.listen()
+    print(f"✓ Build daemon listening on {socket_path} (Ctrl+C to stop)")
+    # Stopping with kill also removes the socket
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        while True:
+            connection, _ = server.accept()
+            with connection:
+                _handle(connection, run)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        try:
+            os.unlink(socket_path)
+        except OSError:
+            pass
+    return True
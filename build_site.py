@@ -4,44 +4,177 @@ Convert an Obsidian vault to a single-folder static site.
 
 Usage
 -----
-    python build_site.py <vault_dir> <output_dir>
+    python build_site.py <vault_dir> [output_dir] [theme_name] [--jobs N] [--no-cache]
+                                                           [--timings] [--profile FILE]
+    python build_site.py diff <old_manifest> <new_manifest> [--json FILE]
+    python build_site.py merge <output_dir> <shard_dir>... [--deploy-manifest]
+    python build_site.py daemon [--daemon-socket PATH]
 
 Requires
 --------
     pip install markdown pygments
 """
 
-import sys, re, shutil, unicodedata, datetime
+import sys, os, re, json, time, datetime, functools
 from pathlib import Path
-import markdown
+from build_timings import BuildTimings
+from render_cache import RenderCache, HighlightCache, DEFAULT_CACHE_SIZE_MB
+from site_output import OutputWriter, begin_stage, discard_stage, publish
+from postprocess import precompress, Fingerprinter
+from deploy_manifest import MANIFEST_NAME, load_manifest, write_manifest, diff_manifests
+from shards import parse_shard, shard_of, write_shard_manifest, merge_shards
+from search_index import SearchIndexBuilder, SEARCH_PAGE, SEARCH_PAGE_HTML, SEARCH_SCRIPT, SEARCH_CSS, DEFAULT_SEARCH_MEMORY_MB
+from vault_snapshot import VaultSnapshot, classify, snapshot_path, NOTE, ASSET
+from build_daemon import default_socket_path, run_in_daemon, serve_daemon
+from wikilinks import (LinkIndex, LinkGraph, GRAPH_NAME, backlinks_html, slugify, broken_links, link_report,
+                       BACKLINKS_CSS, LINK_BY_ALIAS, LINK_BY_TITLE, LINK_BY_SLUG, LINK_BY_NAME, LINK_BY_PATH)
+from transclusion import Transcluder, EMBED_CSS
 
-HIGHLIGHT_RE = re.compile(r'==(.+?)==')
+# Bump when a change to the build alters rendered note HTML (invalidates caches)
+GENERATOR_VERSION = "1"
 
-def slugify(text:str, allow_unicode=False)->str:
-    if allow_unicode:
-        text = unicodedata.normalize("NFKC", text)
-    else:
-        text = unicodedata.normalize("NFKD", text).encode("ascii","ignore").decode()
-    text = re.sub(r"[^\w\s-]", "", text.lower())
-    return re.sub(r"[-\s]+", "-", text).strip("-_")
+# ── transclusion ───────────────────────────────────────────────────────────────
+def new_transcluder(vault:Path, index:LinkIndex, cache=None) -> Transcluder:
+    """Return a Transcluder that renders embedded notes like articles, through the render cache"""
+    md = None
+    
+    def source(file):
+        note = read_note(vault, file)
+        return note[0], page_url(note[1]), note[5]
+    
+    def render(markdown, depth):
+        nonlocal md
+        text = preprocess(markdown, None, index, depth)
+        key = cache.key(text) if cache else None
+        entry = cache.get(key) if cache else None
+        if entry is not None:
+            return entry["html"]
+        if md is None:
+            md = new_markdown()
+        html, meta, seconds, highlight_seconds = render_note(md, text)
+        if cache:
+            cache.put(key, {"html": html, "meta": meta})
+        return html
+    
+    return Transcluder(vault, source, render)
+
+# ── backlinks and link graph ───────────────────────────────────────────────────
+def graph_note(graph:LinkGraph, note, targets):
+    """Record a note's links in `graph`; return the page URLs whose backlinks changed.
+    
+    Notes starting with "_" are left out, as they are from the navigation and search.
+    """
+    if note[4].stem.startswith("_"):
+        return graph.remove(note[4])
+    return graph.set_note(note[4], page_url(note[1]), note[0], targets)
+
+def link_graph(notes, links, index:LinkIndex) -> LinkGraph:
+    """Invert the wikilinks collected by collect_notes into a LinkGraph"""
+    graph = LinkGraph(index)
+    for note in notes:
+        graph_note(graph, note, links.get(note[4], ()))
+    return graph
 
 # ── pre-processor ──────────────────────────────────────────────────────────────
-def preprocess(md:str) -> str:
-    # ==highlight== → <mark>
-    md = HIGHLIGHT_RE.sub(lambda m:f"<mark>{m.group(1)}</mark>", md)
-
-    # ![[Embed]] first
-    def embed(m):
-        inner=m.group(1).strip(); tgt, *alias=inner.split("|",1)
-        disp=alias[0] if alias else tgt; return f"![{disp}]({slugify(tgt)}.html)"
-    md = re.sub(r"!\[\[([^\]]+)\]\]", embed, md)
-
-    # [[WikiLink]]
-    def link(m):
-        inner=m.group(1).strip(); tgt,*alias=inner.split("|",1)
-        disp=alias[0] if alias else tgt; return f"[{disp}]({slugify(tgt)}.html)"
-    md = re.sub(r"\[\[([^\]]+)\]\]", link, md)
-    return md
+# A single left-to-right scan over the note. The next occurrence of each token
+# marker ("`", "~~~", "[[", "==") is found with str.find. The earliest one is
+# handled, and only markers that fall inside it are searched again. Fenced
+# code blocks and inline code spans are copied through untouched.
+WIKILINK_RE = re.compile(r"(!?)\[\[([^\]]+)\]\]")
+RUN_RE = {"`": re.compile(r"`+"), "~": re.compile(r"~+")}
+PARAGRAPH_END_RE = re.compile(r"\n[ \t]*\n")
+_NO_LINKS = LinkIndex()  # Resolves nothing: every wikilink points at its guessed clean URL
+
+@functools.lru_cache(maxsize=None)
+def _fence_close_re(mark:str):
+    return re.compile(rf"^[ ]{{0,3}}{re.escape(mark[0])}{{{len(mark)},}}[ \t]*$", re.M)
+
+def _at_line_start(md:str, i:int) -> bool:
+    """Check if only up to three spaces precede position i on its line"""
+    start = md.rfind("\n", 0, i) + 1
+    return i - start <= 3 and md[start:i].strip(" ") == ""
+
+def _fence_end(md:str, i:int, mark:str) -> int:
+    """Return the end of the fenced block opened by `mark` at i (or the end of the note)"""
+    close = _fence_close_re(mark).search(md, md.find("\n", i) + 1 or len(md))
+    return close.end() if close else len(md)
+
+def preprocess(md:str, links=None, index=None, depth=1) -> str:
+    """Rewrite Obsidian syntax to Markdown for a page at `depth`.
+    
+    Wikilinks are resolved through the LinkIndex `index`, and their targets
+    (the part before any "#" or "|") are appended to `links`.
+    """
+    index = index or _NO_LINKS
+    out = []
+    pos = 0
+    n = len(md)
+    found = {"`": md.find("`"), "~~~": md.find("~~~"), "[[": md.find("[["), "==": md.find("==")}
+    
+    while True:
+        # Earliest remaining marker
+        marker, i = None, n
+        for key, at in found.items():
+            if 0 <= at < i:
+                marker, i = key, at
+        if marker is None:
+            break
+        
+        start, end, text = i, None, None
+        if marker == "`":
+            run_end = RUN_RE["`"].match(md, i).end()
+            mark = md[i:run_end]
+            if len(mark) >= 3 and _at_line_start(md, i):
+                end = _fence_end(md, i, mark)
+            else:
+                # An inline code span closes at the next run of exactly the same length in the paragraph
+                para = PARAGRAPH_END_RE.search(md, run_end)
+                limit = para.start() if para else n
+                j = md.find(mark, run_end, limit)
+                while j != -1 and RUN_RE["`"].match(md, j).end() != j + len(mark):
+                    j = md.find(mark, RUN_RE["`"].match(md, j).end(), limit)
+                end = j + len(mark) if j != -1 else run_end
+        elif marker == "~~~":
+            run_end = RUN_RE["~"].match(md, i).end()
+            if _at_line_start(md, i):
+                end = _fence_end(md, i, md[i:run_end])
+            else:
+                end = run_end
+        elif marker == "[[":
+            close = md.find("]", i + 2)
+            if close > i + 2 and md.startswith("]]", close):
+                embed = i > pos and md[i-1] == "!"
+                text, target = index.markdown_link(md[i+2:close], embed, depth)
+                if links is not None and target:
+                    links.append(target)
+                start, end = (i - 1 if embed else i), close + 2
+        else:  # "=="
+            close = md.find("==", i + 3)
+            newline = md.find("\n", i + 2)
+            if close != -1 and (newline == -1 or close < newline):
+                # ==highlight== → <mark>, with any wikilinks inside it resolved
+                def inner_link(m):
+                    markdown_link, target = index.markdown_link(m.group(2), bool(m.group(1)), depth)
+                    if links is not None and target:
+                        links.append(target)
+                    return markdown_link
+                text = f"<mark>{WIKILINK_RE.sub(inner_link, md[i+2:close])}</mark>"
+                end = close + 2
+        
+        if end is None:
+            # Not a token after all; look for this marker again one character on
+            found[marker] = md.find(marker, i + 1)
+            continue
+        
+        out.append(md[pos:start])
+        out.append(md[start:end] if text is None else text)
+        pos = end
+        for key, at in found.items():
+            if 0 <= at < pos:
+                found[key] = md.find(key, pos)
+    
+    out.append(md[pos:])
+    return "".join(out)
 
 # ── navigation generation ─────────────────────────────────────────────────────
 def generate_navigation(pages, vault_index_file=None, current_depth=0):
@@ -124,162 +257,464 @@ def generate_navigation(pages, vault_index_file=None, current_depth=0):
 </ul>
 </div>"""
 
-# ── main build steps ───────────────────────────────────────────────────────────
-def build_notes(vault:Path, out:Path):
-    md = markdown.Markdown(
-        extensions=["toc","footnotes","tables","fenced_code","codehilite","meta"],
-        extension_configs={"codehilite":{"guess_lang":False}},
-        output_format="html5",
-    )
+# ── metadata scan ─────────────────────────────────────────────────────────────
+# Mirrors markdown's NormalizeWhitespace + meta preprocessors so the first pass
+# can read titles without running the full conversion pipeline.
+META_RE = re.compile(r'^[ ]{0,3}(?P<key>[A-Za-z0-9_-]+):\s*(?P<value>.*)')
+META_MORE_RE = re.compile(r'^[ ]{4,}(?P<value>.*)')
+META_BEGIN_RE = re.compile(r'^-{3}(\s.*)?')
+META_END_RE = re.compile(r'^(-{3}|\.{3})(\s.*)?')
+BLANK_LINE_RE = re.compile(r'\n[ \t]*(?:\r?\n|\r)')
+
+def scan_meta(md:str, tab_length=4) -> dict:
+    """Return the front matter of a preprocessed note, exactly as md.Meta would"""
+    if not md.strip():
+        return {}
+    # Front matter always ends at the first blank line, so the rest is never split
+    blank = BLANK_LINE_RE.search(md)
+    if blank:
+        md = md[:blank.start() + 1]
+    md = md.replace("\x02", "").replace("\x03", "")
+    lines = md.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    meta = {}
+    key = None
+    start = 1 if META_BEGIN_RE.match(lines[0].expandtabs(tab_length)) else 0
+    for line in lines[start:]:
+        line = line.expandtabs(tab_length)
+        if line.strip() == '' or META_END_RE.match(line):
+            break
+        m1 = META_RE.match(line)
+        if m1:
+            key = m1.group('key').lower().strip()
+            meta.setdefault(key, []).append(m1.group('value').strip())
+        else:
+            m2 = META_MORE_RE.match(line)
+            if not (m2 and key):
+                break
+            meta[key].append(m2.group('value').strip())
+    return meta
+
+def note_aliases(text:str):
+    """Return the aliases in a note's front matter (comma separated, bracketed or an indented list)"""
+    aliases = []
+    for value in scan_meta(text).get("aliases", []):
+        for alias in value.strip().strip("[]").split(","):
+            alias = alias.strip().lstrip("-").strip().strip("'\"")
+            if alias:
+                aliases.append(alias)
+    return aliases
+
+def read_note(vault:Path, file:Path):
+    """Read one note and return (title, slug, is_index, parent_dir, file, text) with the unprocessed text.
+    
+    The title comes from the raw front matter, so every note's title and
+    aliases are known before any wikilink has to be resolved.
+    """
+    text = file.read_text(encoding="utf-8")
+    title = scan_meta(text).get("title",[file.stem])[0]
+    
+    # Determine relative path from vault root
+    rel_path = file.relative_to(vault)
+    parent_dir = rel_path.parent
+    
+    # Special case: if file name matches the vault directory name, treat it as root index
+    if file.stem.lower() == vault.name.lower():
+        parent_dir = Path(".")  # Force it to be root level
+        is_index = True
+        slug = "index.html"  # This becomes the main index.html
+    else:
+        slug = slugify(file.stem)+".html"
+        # Check if this is a directory index file (same name as directory)
+        is_index = file.stem.lower() == parent_dir.name.lower() if parent_dir.name else False
+    
+    return title, slug, is_index, parent_dir, file, text
+
+def resolve_note(note, index:LinkIndex, links=None):
+    """Return the note with its text preprocessed, wikilinks resolved through `index`"""
+    text = preprocess(note[5], links, index, page_depth(note[1]))
+    return note[:5] + (text,)
+
+def is_note(vault:Path, file:Path) -> bool:
+    """Check if a vault file is rendered as a page (Resources notes are skipped)"""
+    return classify(file.relative_to(vault).as_posix()) == NOTE
+
+def index_pages(notes):
+    """Organize notes by directory for navigation and find the vault index file"""
     pages = {}  # Store pages organized by directory (for navigation only)
-    all_pages = []  # Store all pages for navigation (non-underscore only)
-    all_files_to_process = []  # Store ALL files to process (including underscore files)
     vault_index_file = None  # Track if there's a vault-level index file
     
-    # First pass: collect all pages
-    for file in vault.rglob("*.md"):
-        # Skip files in Resources directory for site generation
-        if "Resources" in file.parts:
-            continue
-            
-        raw=file.read_text(encoding="utf-8")
-        html=md.convert(preprocess(raw))
-        title = md.Meta.get("title",[file.stem])[0] if hasattr(md,"Meta") else file.stem
-        
-        # Determine relative path from vault root
-        rel_path = file.relative_to(vault)
-        parent_dir = rel_path.parent
-        
-        # Special case: if file name matches the vault directory name, treat it as root index
-        vault_name = vault.name
-        if file.stem.lower() == vault_name.lower():
-            parent_dir = Path(".")  # Force it to be root level
-            is_index = True
-            slug = "index.html"  # This becomes the main index.html
+    for title, slug, is_index, parent_dir, file, text in notes:
+        if slug == "index.html" and is_index and parent_dir == Path("."):
             vault_index_file = (title, slug, file)
-        else:
-            slug = slugify(file.stem)+".html"
-            # Check if this is a directory index file (same name as directory)
-            is_index = file.stem.lower() == parent_dir.name.lower() if parent_dir.name else False
-        
-        page_info = (title, slug, is_index, parent_dir, file)
-        all_files_to_process.append(page_info)
-        
         # Only add to navigation if file doesn't start with underscore
         if not file.stem.startswith("_"):
-            # Create directory structure in pages dict
-            if parent_dir not in pages:
-                pages[parent_dir] = []
-            
-            nav_page_info = (title, slug, is_index, parent_dir)
-            pages[parent_dir].append(nav_page_info)
-            all_pages.append(nav_page_info)
-        
-        md.reset()
+            pages.setdefault(parent_dir, []).append((title, slug, is_index, parent_dir))
     
-    # Generate navigation HTML
-    nav_html = generate_navigation(pages, vault_index_file, 0)
+    return pages, vault_index_file
+
+def scan_vault(vault:Path, snapshot=None) -> VaultSnapshot:
+    """Bring `snapshot` (or a new, unsaved one) up to date with the vault"""
+    snapshot = snapshot or VaultSnapshot(vault)
+    snapshot.scan()
+    return snapshot
+
+def index_note(index:LinkIndex, note):
+    """Add a note to `index` under every name a wikilink can use for it; return the link keys whose target changed"""
+    title, slug, file, text = note[0], note[1], note[4], note[5]
+    names = [(LINK_BY_ALIAS, alias) for alias in note_aliases(text)]
+    names += [(LINK_BY_TITLE, title), (LINK_BY_SLUG, slug[:-len(".html")]), (LINK_BY_NAME, file.stem),
+              (LINK_BY_PATH, file.relative_to(index.vault).with_suffix("").as_posix())]
+    return index.add_note(file, names, page_url(slug), page_output_path(slug)[0])
+
+def link_index(vault:Path, notes, snapshot) -> LinkIndex:
+    """Index every note and asset by the names wikilinks can use"""
+    index = LinkIndex(vault)
+    for note in notes:
+        index_note(index, note)
+    for file, size, mtime in snapshot.entries(ASSET):
+        index.add_asset(file)
+    return index
+
+def collect_notes(vault:Path, snapshot=None, links=None):
+    """Read every note once, resolve its wikilinks and collect its title, slug, index flag and parent dir.
     
-    # Second pass: write HTML files with navigation (process ALL files including underscore files)
-    for title, slug, is_index, parent_dir, file_path in all_files_to_process:
-        raw = file_path.read_text(encoding="utf-8")
-        html = md.convert(preprocess(raw))
-        
-        # Create directory structure for clean URLs
-        if slug == "index.html":
-            # Main index stays at root
-            output_path = out / "index.html"
-            css_path = "style.css"
-            current_nav_html = generate_navigation(pages, vault_index_file, 0)
-        else:
-            # Create directory for each page with index.html inside
-            page_name = slug.replace('.html', '')
-            page_dir = out / page_name
-            page_dir.mkdir(exist_ok=True)
-            output_path = page_dir / "index.html"
-            css_path = "../style.css"
-            current_nav_html = generate_navigation(pages, vault_index_file, 1)
-        
-        tpl=f"""<!doctype html><html lang='en'><head>
+    Returns (pages, vault_index_file, notes, link index); the wikilink
+    targets of each note are stored in `links` (note file → list) if given.
+    """
+    snapshot = snapshot or scan_vault(vault)
+    # Store ALL notes to render (including underscore files), skipping the Resources directory.
+    # Sorted, so slug collisions and equal titles resolve the same way on every machine
+    notes = [read_note(vault, file) for file in snapshot.notes()]
+    
+    # Titles and aliases are all known now, so every link resolves in one pass
+    index = link_index(vault, notes, snapshot)
+    links = {} if links is None else links
+    notes = [resolve_note(note, index, links.setdefault(note[4], [])) for note in notes]
+    
+    pages, vault_index_file = index_pages(notes)
+    return pages, vault_index_file, notes, index
+
+# ── page template ─────────────────────────────────────────────────────────────
+# Appended to the theme's style.css, so every page shares one cached copy
+NAV_CSS = """
+/* ── site navigation ── */
+.top-nav { position: fixed; top: 0; left: 0; right: 0; background: var(--paper); padding: 15px 25px; z-index: 1000; border-bottom: 1px solid var(--faint); }
+.nav-container { display: flex; justify-content: space-between; align-items: center; }
+.home-link { flex-shrink: 0; }
+.nav-right { display: flex; list-style: none; margin: 0; padding: 0; }
+.nav-right > li { margin-left: 25px; }
+.dropdown { position: relative; display: inline-block; }
+.dropdown-content { display: none; position: absolute; right: 0; background-color: var(--paper); min-width: 200px; box-shadow: 0px 8px 16px 0px rgba(0,0,0,0.15); z-index: 1001; border: 1px solid var(--faint); border-radius: 4px; }
+.dropdown-content li { list-style: none; }
+.dropdown-content a { color: var(--ink); padding: 10px 15px; text-decoration: none; display: block; font-size: 14px; border-bottom: 1px solid #f0f0f0; }
+.dropdown-content a:last-child { border-bottom: none; }
+.dropdown-content a:hover { background-color: var(--highlight); }
+.dropdown:hover .dropdown-content { display: block; }
+.dropdown-main { display: inline-block; padding: 8px 0; cursor: pointer; color: var(--ink); text-decoration: none; }
+.dropdown-main:hover { color: var(--accent); }
+.nav-link { display: inline-block; padding: 8px 0; text-decoration: none; color: var(--ink); }
+.nav-link:hover { color: var(--accent); }
+.home-link { list-style: none; }
+body { padding-top: 70px; }
+"""
+
+# Appended to every theme's CSS
+SITE_CSS = NAV_CSS + SEARCH_CSS + BACKLINKS_CSS + EMBED_CSS
+
+def render_page(title, html, nav_html, css_path="style.css") -> str:
+    """Wrap rendered note HTML in the site template"""
+    return f"""<!doctype html><html lang='en'><head>
 <meta charset='utf-8'><meta name='viewport' content='width=device-width,initial-scale=1'>
 <title>{title}</title><link rel='stylesheet' href='{css_path}'>
-<style>
-.top-nav {{ position: fixed; top: 0; left: 0; right: 0; background: var(--paper); padding: 15px 25px; z-index: 1000; border-bottom: 1px solid var(--faint); }}
-.nav-container {{ display: flex; justify-content: space-between; align-items: center; }}
-.home-link {{ flex-shrink: 0; }}
-.nav-right {{ display: flex; list-style: none; margin: 0; padding: 0; }}
-.nav-right > li {{ margin-left: 25px; }}
-.dropdown {{ position: relative; display: inline-block; }}
-.dropdown-content {{ display: none; position: absolute; right: 0; background-color: var(--paper); min-width: 200px; box-shadow: 0px 8px 16px 0px rgba(0,0,0,0.15); z-index: 1001; border: 1px solid var(--faint); border-radius: 4px; }}
-.dropdown-content li {{ list-style: none; }}
-.dropdown-content a {{ color: var(--ink); padding: 10px 15px; text-decoration: none; display: block; font-size: 14px; border-bottom: 1px solid #f0f0f0; }}
-.dropdown-content a:last-child {{ border-bottom: none; }}
-.dropdown-content a:hover {{ background-color: var(--highlight); }}
-.dropdown:hover .dropdown-content {{ display: block; }}
-.dropdown-main {{ display: inline-block; padding: 8px 0; cursor: pointer; color: var(--ink); text-decoration: none; }}
-.dropdown-main:hover {{ color: var(--accent); }}
-.nav-link {{ display: inline-block; padding: 8px 0; text-decoration: none; color: var(--ink); }}
-.nav-link:hover {{ color: var(--accent); }}
-.home-link {{ list-style: none; }}
-body {{ padding-top: 70px; }}
-</style>
 </head><body>
-<nav class="top-nav">{current_nav_html}</nav>
+<nav class="top-nav">{nav_html}</nav>
 <article>
 {html}
 </article></body></html>"""
-        output_path.write_text(tpl,encoding="utf-8")
-        md.reset()
+
+def page_depth(slug:str) -> int:
+    """Return how deep a page's output sits below the site root"""
+    return 0 if slug == "index.html" else 1
+
+def page_output_path(slug:str):
+    """Return (output path relative to the site root, css_path, depth) for a page slug using clean URLs"""
+    if page_depth(slug) == 0:
+        # Main index stays at root
+        return "index.html", "style.css", 0
+    # Directory for each page with index.html inside
+    return slug.replace('.html', '') + "/index.html", "../style.css", 1
+
+# ── main build steps ───────────────────────────────────────────────────────────
+MD_EXTENSIONS = ["toc","footnotes","tables","fenced_code","codehilite","meta"]
+MD_EXTENSION_CONFIGS = {"codehilite":{"guess_lang":False}}
+MD_OUTPUT_FORMAT = "html5"
+
+def new_markdown():
+    # Markdown, its extensions and Pygments are imported here, on first use,
+    # so commands that render nothing start quickly
+    import markdown
+    _patch_codehilite()
+    return markdown.Markdown(
+        extensions=MD_EXTENSIONS,
+        extension_configs=MD_EXTENSION_CONFIGS,
+        output_format=MD_OUTPUT_FORMAT,
+    )
+
+def render_cache_salt() -> str:
+    """Describe everything besides note text that affects rendered HTML"""
+    import markdown
+    try:
+        import pygments
+        pygments_version = pygments.__version__
+    except ImportError:
+        pygments_version = None
+    return repr((GENERATOR_VERSION, markdown.__version__, pygments_version,
+                 MD_EXTENSIONS, MD_EXTENSION_CONFIGS, MD_OUTPUT_FORMAT))
+
+# Code blocks are highlighted through a memo keyed by everything CodeHilite
+# feeds to Pygments, so unchanged snippets skip lexing and formatting. Time
+# spent here is accumulated per process so render timings can split it out.
+_highlight_cache = HighlightCache()
+_highlight_seconds = 0.0
+
+def _cached_hilite(hilite):
+    @functools.wraps(hilite)
+    def cached(self, *args, **kwargs):
+        global _highlight_seconds
+        started = time.perf_counter()
+        try:
+            inputs = repr((sorted(vars(self).items()), args, sorted(kwargs.items())))
+            return _highlight_cache.lookup(inputs, lambda: hilite(self, *args, **kwargs))
+        finally:
+            _highlight_seconds += time.perf_counter() - started
+    return cached
+
+def _patch_codehilite():
+    from markdown.extensions.codehilite import CodeHilite
+    if not hasattr(CodeHilite.hilite, "__wrapped__"):
+        CodeHilite.hilite = _cached_hilite(CodeHilite.hilite)
+
+def use_highlight_cache(cache:HighlightCache):
+    """Highlight code blocks through `cache` in this process and in render workers started later"""
+    global _highlight_cache
+    _highlight_cache = cache
+
+def render_note(md, text):
+    """Return (html, meta, render seconds, highlight seconds) for one preprocessed note"""
+    highlight_before = _highlight_seconds
+    started = time.perf_counter()
+    html = md.convert(text)
+    meta = md.Meta
+    md.reset()
+    return html, meta, time.perf_counter() - started, _highlight_seconds - highlight_before
+
+_worker_md = None  # Per-process Markdown instance used by render workers
+
+def _init_render_worker(highlight_cache):
+    global _worker_md
+    _worker_md = new_markdown()
+    use_highlight_cache(highlight_cache)
+
+def _render_in_worker(text):
+    return render_note(_worker_md, text)
+
+def render_notes(texts, jobs=1, md=None):
+    """Yield (html, meta, seconds, highlight_seconds) for each preprocessed note, in input order"""
+    if jobs <= 1 or len(texts) < 2:
+        md = md or new_markdown()
+        for text in texts:
+            yield render_note(md, text)
+        return
     
-    return pages, vault_index_file
+    # One Markdown instance per worker; map() keeps results in input order
+    from concurrent.futures import ProcessPoolExecutor
+    chunksize = max(1, len(texts) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_render_worker,
+                             initargs=(_highlight_cache,)) as pool:
+        yield from pool.map(_render_in_worker, texts, chunksize=chunksize)
+
+def render_articles(notes, jobs=1, cache=None, md=None, timings=None):
+    """Yield (note, html) for every note, serving unchanged notes from the cache.
+    
+    Cache hits come first; the remaining notes are rendered with render_notes.
+    When `timings` is given, every rendered note's time and size is recorded.
+    """
+    to_render = []
+    for note in notes:
+        key = cache.key(note[5]) if cache else None
+        entry = cache.get(key) if cache else None
+        if entry is None:
+            to_render.append((note, key))
+        else:
+            if timings:
+                timings.cached += 1
+            yield note, entry["html"]
+    
+    rendered = render_notes([note[5] for note, key in to_render], jobs, md)
+    for (note, key), (html, meta, seconds, highlight_seconds) in zip(to_render, rendered):
+        if cache:
+            cache.put(key, {"html": html, "meta": meta})
+        if timings:
+            timings.note(note[1], seconds, highlight_seconds, len(html))
+        yield note, html
+
+def write_page(out:OutputWriter, note, html, nav_by_depth, backlinks=()):
+    """Wrap a rendered note and its backlinks in the template and write it; return True if the file changed"""
+    title, slug = note[0], note[1]
+    output_path, css_path, depth = page_output_path(slug)
+    html += backlinks_html(backlinks, depth)
+    return out.write_text(output_path, render_page(title, html, nav_by_depth[depth], css_path))
+
+# In "shared" nav mode pages carry a placeholder and load the menu from one
+# nav.js file, instead of every page inlining the full menu.
+NAV_MODES = ("inline", "shared")
+
+NAV_SCRIPT = """(function () {
+  var script = document.currentScript, root = script.getAttribute('data-root') || '';
+  var nav = document.getElementById('site-nav');
+  nav.innerHTML = NAV_HTML;
+  nav.querySelectorAll('a[href]').forEach(function (a) { a.setAttribute('href', root + a.getAttribute('href')); });
+})();
+"""
+
+def _with_search_link(nav_html, prefix):
+    """Add a Search entry at the end of the navigation's right-hand list"""
+    head, sep, tail = nav_html.rpartition("</ul>")
+    return f"{head}<li><a href='{prefix}search/' class='nav-link'>Search</a></li>\n{sep}{tail}" if sep else nav_html
+
+def navigation_html(pages, vault_index_file, depth, nav="inline", search=False):
+    """Return the markup that goes inside a page's <nav> at the given depth"""
+    if nav == "shared":
+        prefix = "../" if depth > 0 else ""
+        return (f"<div id='site-nav'><noscript><a href='{prefix}index.html' class='nav-link'>Home</a></noscript></div>"
+                f"<script src='{prefix}nav.js' data-root='{prefix}'></script>")
+    nav_html = generate_navigation(pages, vault_index_file, depth)
+    return _with_search_link(nav_html, "../" if depth > 0 else "") if search else nav_html
+
+def navigation_by_depth(pages, vault_index_file, nav="inline", search=False):
+    """Generate the navigation once for each page depth (0 = root, 1 = subdirectory)"""
+    return {depth: navigation_html(pages, vault_index_file, depth, nav, search) for depth in (0, 1)}
+
+def write_navigation_script(out, pages, vault_index_file, search=False):
+    """Write nav.js, the single copy of the menu used by pages in shared nav mode"""
+    nav_html = generate_navigation(pages, vault_index_file, 0)
+    if search:
+        nav_html = _with_search_link(nav_html, "")
+    return OutputWriter.wrap(out).write_text("nav.js", NAV_SCRIPT.replace("NAV_HTML", json.dumps(nav_html)))
+
+def page_url(slug:str) -> str:
+    """Return a page's clean URL relative to the site root ("" for the home page)"""
+    return page_output_path(slug)[0][:-len("index.html")]
+
+def search_index_builder(notes, memory_mb=DEFAULT_SEARCH_MEMORY_MB):
+    """Return a SearchIndexBuilder covering every note shown in the navigation, in URL order"""
+    titles = {page_url(note[1]): note[0] for note in notes if not note[4].stem.startswith("_")}
+    return SearchIndexBuilder(sorted(titles.items()), memory_mb)
 
-def copy_assets(vault:Path, out:Path):
-    for f in vault.rglob("*"):
-        if f.is_dir() or f.suffix.lower() in {".md",".canvas"}: continue
-        dest=out/f.relative_to(vault); dest.parent.mkdir(parents=True,exist_ok=True)
-        shutil.copy2(f,dest)
+def write_search_page(out, nav_by_depth):
+    """Write the search page and its script"""
+    out.write_text("search/search.js", SEARCH_SCRIPT)
+    out.write_text(SEARCH_PAGE, render_page("Search", SEARCH_PAGE_HTML, nav_by_depth[1], "../style.css"))
 
-def write_index(pages, vault_index_file, out:Path):
+def build_notes(vault:Path, out, jobs=1, cache=None, nav="inline", timings=None, shard=None, search=None, snapshot=None,
+                links=None, backlinks=False):
+    """Render and write every note's page; with `shard` (i, N) only the pages assigned to shard i.
+    
+    `search` is the memory budget in MB for building the search index, or None for no search.
+    The wikilink targets of each note are stored in `links` if given. With
+    `backlinks`, pages list the pages linking to them and graph.json is written.
+    Returns (pages, vault_index_file, link index).
+    """
+    out = OutputWriter.wrap(out)
+    timings = timings or BuildTimings()
+    
+    # First pass: read every note once and collect metadata without rendering
+    with timings.stage("scan"):
+        links = {} if links is None and backlinks else links
+        pages, vault_index_file, notes, link_index = collect_notes(vault, snapshot, links)
+        if search is not None:
+            # The search page owns its path; a note mapping there is left out and reported as a collision
+            link_index.reserve(SEARCH_PAGE, "search page")
+            notes = [note for note in notes if page_output_path(note[1])[0] != SEARCH_PAGE]
+            pages, vault_index_file = index_pages(notes)
+    
+    # Backlinks invert the links found while scanning, so no note is read twice
+    graph = None
+    if backlinks:
+        with timings.stage("graph"):
+            graph = link_graph(notes, links, link_index)
+            # Bytes, so --fingerprint keeps the fixed name scripts fetch it by
+            out.write_bytes(GRAPH_NAME, graph.to_json().encode("utf-8"))
+    
+    # Navigation is computed once here, never in the render workers
+    with timings.stage("navigation"):
+        nav_by_depth = navigation_by_depth(pages, vault_index_file, nav, search is not None)
+        if nav == "shared":
+            write_navigation_script(out, pages, vault_index_file, search is not None)
+    
+    if shard:
+        # Every shard scans all notes, so navigation and links agree across shards
+        page_paths = [page_output_path(note[1])[0] for note in notes]
+        write_shard_manifest(out, shard, page_paths)
+        notes = [note for note, rel in zip(notes, page_paths) if shard_of(rel, shard[1]) == shard[0]]
+    
+    # The search index is filled as pages stream out of the renderer
+    index = search_index_builder(notes, search) if search is not None else None
+    if index:
+        write_search_page(out, nav_by_depth)
+    
+    # Second pass: render and write HTML files with navigation (ALL files including underscore files)
+    embeds = new_transcluder(vault, link_index, cache)
+    for note, html in timings.iterate("render", render_articles(notes, jobs, cache, timings=timings)):
+        with timings.stage("embeds"):
+            html, _ = embeds.expand(html, page_depth(note[1]), note[4])
+        with timings.stage("write"):
+            write_page(out, note, html, nav_by_depth, graph.backlinks(page_url(note[1])) if graph else ())
+        if index:
+            with timings.stage("search"):
+                index.add(page_url(note[1]), html)
+    
+    if index:
+        with timings.stage("search"):
+            index.write(out)
+    
+    return pages, vault_index_file, link_index
+
+def is_asset(file:Path) -> bool:
+    """Check if a vault file is copied to the output as-is"""
+    return classify(file.name) == ASSET
+
+def copy_asset(vault:Path, out:OutputWriter, f:Path, stat=None):
+    return out.copy_file(f, f.relative_to(vault).as_posix(), stat)
+
+def copy_assets(vault:Path, out, snapshot=None):
+    out = OutputWriter.wrap(out)
+    snapshot = snapshot or scan_vault(vault)
+    for f, size, mtime in snapshot.entries(ASSET):
+        copy_asset(vault, out, f, (size, mtime))
+
+def write_index(pages, vault_index_file, out, nav="inline", generated=None, search=False):
+    """Write a placeholder index page; `generated` (e.g. today's date) is shown on it if given"""
     # Only create a dummy index if there's no vault-level index file
     if vault_index_file is None:
-        nav_html = generate_navigation(pages, vault_index_file)
+        nav_html = navigation_html(pages, vault_index_file, 0, nav, search)
         
         # Create a simple index page with navigation
         html=f"""<!doctype html><html lang='en'><head>
 <meta charset='utf-8'><meta name='viewport' content='width=device-width,initial-scale=1'>
 <title>Site Index</title><link rel='stylesheet' href='style.css'>
-<style>
-.top-nav {{ position: fixed; top: 0; left: 0; right: 0; background: var(--paper); padding: 15px 25px; z-index: 1000; border-bottom: 1px solid var(--faint); }}
-.nav-container {{ display: flex; justify-content: space-between; align-items: center; }}
-.home-link {{ flex-shrink: 0; }}
-.nav-right {{ display: flex; list-style: none; margin: 0; padding: 0; }}
-.nav-right > li {{ margin-left: 25px; }}
-.dropdown {{ position: relative; display: inline-block; }}
-.dropdown-content {{ display: none; position: absolute; right: 0; background-color: var(--paper); min-width: 200px; box-shadow: 0px 8px 16px 0px rgba(0,0,0,0.15); z-index: 1001; border: 1px solid var(--faint); border-radius: 4px; }}
-.dropdown-content li {{ list-style: none; }}
-.dropdown-content a {{ color: var(--ink); padding: 10px 15px; text-decoration: none; display: block; font-size: 14px; border-bottom: 1px solid #f0f0f0; }}
-.dropdown-content a:last-child {{ border-bottom: none; }}
-.dropdown-content a:hover {{ background-color: var(--highlight); }}
-.dropdown:hover .dropdown-content {{ display: block; }}
-.dropdown-main {{ display: inline-block; padding: 8px 0; cursor: pointer; color: var(--ink); text-decoration: none; }}
-.dropdown-main:hover {{ color: var(--accent); }}
-.nav-link {{ display: inline-block; padding: 8px 0; text-decoration: none; color: var(--ink); }}
-.nav-link:hover {{ color: var(--accent); }}
-.home-link {{ list-style: none; }}
-body {{ padding-top: 70px; }}
-</style>
 </head><body>
 <nav class="top-nav">{nav_html}</nav>
 <article>
 <h1>Site Index</h1>
 <p>Welcome to the site. Use the navigation menu above to browse all pages.</p>
-<p class='generated'>Generated {datetime.date.today()}</p>
+{f"<p class='generated'>Generated {generated}</p>" if generated else ""}
 </article>
 </body></html>"""
-        (out/"index.html").write_text(html,encoding="utf-8")
+        OutputWriter.wrap(out).write_text("index.html", html)
 
-def copy_theme(script_dir: Path, out: Path, theme_name: str = "paper-theme"):
-    """Copy theme CSS file to output directory"""
+def copy_theme(script_dir: Path, out, theme_name: str = "paper-theme"):
+    """Write the theme CSS, followed by the site's own styles, as style.css"""
     themes_dir = script_dir / "Themes"
     theme_file = themes_dir / f"{theme_name}.css"
     
@@ -290,8 +725,8 @@ def copy_theme(script_dir: Path, out: Path, theme_name: str = "paper-theme"):
             print(f"Warning: Theme '{theme_name}' not found, and default paper-theme.css is missing")
             return False
     
-    # Copy theme as style.css in output
-    shutil.copy2(theme_file, out / "style.css")
+    # Theme plus navigation, search, backlink and embed styles as style.css in output
+    OutputWriter.wrap(out).write_text("style.css", theme_file.read_text(encoding="utf-8") + SITE_CSS)
     return True
 
 def list_available_themes(script_dir: Path):
@@ -307,9 +742,270 @@ def list_available_themes(script_dir: Path):
     
     return sorted(themes)
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python build_site.py <vault_dir> [output_dir] [theme_name]")
+def resolve_jobs(jobs:int) -> int:
+    """Map a --jobs value to a worker count (0 means one per CPU core)"""
+    return jobs if jobs > 0 else (os.cpu_count() or 1)
+
+def default_build_options():
+    return {
+        "jobs": 1,
+        "cache": True,
+        "cache_dir": None,  # None = .ssg-cache next to this script
+        "cache_size": DEFAULT_CACHE_SIZE_MB,
+        "nav": "inline",
+        "timings": False,
+        "timings_json": None,
+        "profile": None,
+        "minify": False,
+        "precompress": False,
+        "fingerprint": False,
+        "deploy_manifest": False,
+        "stamp_date": False,
+        "shard": None,  # (i, N) to render only shard i of N
+        "search": False,
+        "search_memory": DEFAULT_SEARCH_MEMORY_MB,
+        "daemon": False,
+        "daemon_socket": None,  # None = default_socket_path()
+        "check_links": False,
+        "backlinks": False,
+    }
+
+def parse_build_option(args, i, options):
+    """Consume the build option at args[i] into `options`.
+    
+    Returns the index of the next argument, or None if args[i] is not a build
+    option. Raises ValueError for malformed option values.
+    """
+    arg = args[i]
+    value = args[i + 1] if i + 1 < len(args) else None
+    
+    if arg == "--jobs" and value is not None:
+        options["jobs"] = resolve_jobs(int(value))
+        return i + 2
+    if arg == "--no-cache":
+        options["cache"] = False
+        return i + 1
+    if arg == "--cache-dir" and value is not None:
+        options["cache_dir"] = value
+        return i + 2
+    if arg == "--cache-size" and value is not None:
+        options["cache_size"] = int(value)
+        return i + 2
+    if arg == "--nav" and value is not None:
+        if value not in NAV_MODES:
+            raise ValueError(value)
+        options["nav"] = value
+        return i + 2
+    if arg == "--timings":
+        options["timings"] = True
+        return i + 1
+    if arg == "--timings-json" and value is not None:
+        options["timings_json"] = value
+        return i + 2
+    if arg == "--profile" and value is not None:
+        options["profile"] = value
+        return i + 2
+    if arg == "--minify":
+        options["minify"] = True
+        return i + 1
+    if arg == "--precompress":
+        options["precompress"] = True
+        return i + 1
+    if arg == "--fingerprint":
+        options["fingerprint"] = True
+        return i + 1
+    if arg == "--deploy-manifest":
+        options["deploy_manifest"] = True
+        return i + 1
+    if arg == "--stamp-date":
+        options["stamp_date"] = True
+        return i + 1
+    if arg == "--shard" and value is not None:
+        options["shard"] = parse_shard(value)
+        return i + 2
+    if arg == "--search":
+        options["search"] = True
+        return i + 1
+    if arg == "--search-memory" and value is not None:
+        options["search_memory"] = int(value)
+        return i + 2
+    if arg == "--daemon":
+        options["daemon"] = True
+        return i + 1
+    if arg == "--daemon-socket" and value is not None:
+        options["daemon_socket"] = value
+        return i + 2
+    if arg == "--check-links":
+        options["check_links"] = True
+        return i + 1
+    if arg == "--backlinks":
+        options["backlinks"] = True
+        return i + 1
+    return None
+
+BUILD_OPTIONS_HELP = """\
+  --jobs N          Render pages in N worker processes (0 = one per CPU core)
+  --no-cache        Render every note, ignoring the on-disk render cache
+  --cache-dir DIR   Render cache location (default: .ssg-cache next to build_site.py)
+  --cache-size MB   Evict least recently used cache entries above this size (default: 512)
+  --nav MODE        inline: menu in every page (default); shared: one nav.js loaded by all pages
+  --timings         Print per-stage wall/CPU time, the slowest notes and peak memory
+  --timings-json F  Write the timings report as JSON to F
+  --profile FILE    Write a cProfile dump of the build to FILE (view with pstats or snakeviz)
+  --minify          Minify generated HTML and CSS
+  --precompress     Write .gz (and .br with brotli installed) next to changed files (build_site.py only)
+  --fingerprint     Rename style.css and assets to name.<hash>.ext, rewrite references, write
+                    asset-manifest.json (build_site.py only)
+  --deploy-manifest Write deploy-manifest.json: path, size and SHA-256 of every output file
+  --stamp-date      Show the build date on the generated index page (output is no longer reproducible)
+  --shard I/N       Render only the pages of shard I of N; combine them with the merge command (build_site.py only)
+  --search          Add a search page backed by a static index split by term prefix (build_site.py only)
+  --search-memory MB  Memory budget for building the search index before spilling to disk (default: 64)
+  --daemon          Run the build in the warm build daemon if one is listening (build_site.py only)
+  --daemon-socket P Unix socket of the build daemon (default: in $XDG_RUNTIME_DIR or /tmp)
+  --check-links     Report broken wikilinks and pages several notes map to; build_site.py fails the build on them
+  --backlinks       List the pages linking to each page under it, and write graph.json for a graph view"""
+
+def open_render_cache(options, script_dir:Path):
+    """Return the RenderCache selected by `options`, or None when caching is off"""
+    if not options["cache"]:
+        return None
+    cache_dir = Path(options["cache_dir"]).expanduser() if options["cache_dir"] else script_dir / ".ssg-cache"
+    return RenderCache(cache_dir / "render", render_cache_salt(), options["cache_size"] * 1024 * 1024)
+
+def open_vault_snapshot(options, script_dir:Path, vault:Path) -> VaultSnapshot:
+    """Return the vault's snapshot, saved next to the render cache unless caching is off"""
+    if not options["cache"]:
+        return VaultSnapshot(vault)
+    cache_dir = Path(options["cache_dir"]).expanduser() if options["cache_dir"] else script_dir / ".ssg-cache"
+    return VaultSnapshot(vault, snapshot_path(cache_dir, vault))
+
+_highlight_caches = {}  # Kept for the lifetime of the process, so a build daemon stays warm
+
+def open_highlight_cache(options, script_dir:Path):
+    """Return the code highlighting cache, persisted next to the render cache unless caching is off"""
+    cache_dir = Path(options["cache_dir"]).expanduser() if options["cache_dir"] else script_dir / ".ssg-cache"
+    key = (options["cache"], str(cache_dir), options["cache_size"])
+    if key not in _highlight_caches:
+        if not options["cache"]:
+            _highlight_caches[key] = HighlightCache()
+        else:
+            disk = RenderCache(cache_dir / "highlight", render_cache_salt(), options["cache_size"] * 1024 * 1024)
+            _highlight_caches[key] = HighlightCache(disk=disk)
+    return _highlight_caches[key]
+
+def parse_arguments(args):
+    """Split command line arguments into positional arguments and build options"""
+    positional = []
+    options = default_build_options()
+    
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        
+        try:
+            next_i = parse_build_option(args, i, options)
+        except ValueError:
+            print(f"Invalid value for {arg}: {args[i + 1]}")
+            return None, None
+        
+        if next_i is not None:
+            i = next_i
+        elif arg.startswith("--"):
+            print(f"Unknown argument: {arg}")
+            return None, None
+        else:
+            positional.append(arg)
+            i += 1
+    
+    return positional, options
+
+def diff_command(args):
+    """python build_site.py diff <old-manifest> <new-manifest> [--json FILE]"""
+    json_path = args[args.index("--json") + 1] if "--json" in args[:-1] else None
+    paths = [arg for i, arg in enumerate(args) if arg != "--json" and (i == 0 or args[i - 1] != "--json")]
+    if len(paths) != 2:
+        print("Usage: python build_site.py diff <old_manifest> <new_manifest> [--json FILE]")
+        sys.exit(1)
+    
+    # A missing old manifest means a first deploy: everything is added
+    old = load_manifest(paths[0]) if Path(paths[0]).exists() else {}
+    diff = diff_manifests(old, load_manifest(paths[1]))
+    if json_path:
+        Path(json_path).write_text(json.dumps(diff, indent=1) + "\n", encoding="utf-8")
+    else:
+        for marker, key in (("+", "added"), ("~", "changed"), ("-", "removed")):
+            for rel in diff[key]:
+                print(f"{marker} {rel}")
+    print(f"✓ {len(diff['added'])} added, {len(diff['changed'])} changed, {len(diff['removed'])} removed")
+
+def merge_command(args):
+    """python build_site.py merge <output_dir> <shard_dir>... [--deploy-manifest]"""
+    paths = [arg for arg in args if not arg.startswith("--")]
+    if len(paths) < 2:
+        print("Usage: python build_site.py merge <output_dir> <shard_dir>... [--deploy-manifest]")
+        sys.exit(1)
+    
+    out = Path(paths[0]).expanduser().resolve()
+    stage = begin_stage(out)
+    writer = OutputWriter(stage)
+    try:
+        count = merge_shards(writer, [Path(p).expanduser().resolve() for p in paths[1:]])
+        if "--deploy-manifest" in args:
+            write_manifest(writer)
+        writer.prune()
+    except ValueError as e:
+        discard_stage(out)
+        print(f"✗ Merge failed: {e}")
+        sys.exit(1)
+    except BaseException:
+        discard_stage(out)
+        raise
+    publish(stage, out, writer.changed)
+    print(f"✓ Merged {count} shard(s) into {out}")
+
+_in_daemon = False  # True inside the build daemon, which runs main() for each client
+
+def daemon_command(args):
+    """python build_site.py daemon [--daemon-socket PATH]"""
+    global _in_daemon
+    positional, options = parse_arguments(args)
+    if positional is None:
+        sys.exit(1)
+    socket_path = options["daemon_socket"] or default_socket_path()
+    
+    # Pay for the imports now instead of on the first build
+    new_markdown()
+    _in_daemon = True
+    if not serve_daemon(socket_path, main):
+        sys.exit(1)
+
+def main(args=None):
+    args = sys.argv[1:] if args is None else args
+    if args[:1] == ["diff"]:
+        diff_command(args[1:])
+        return
+    if args[:1] == ["merge"]:
+        merge_command(args[1:])
+        return
+    if args[:1] == ["daemon"]:
+        daemon_command(args[1:])
+        return
+    
+    positional, options = parse_arguments(args)
+    if positional is None:
+        sys.exit(1)
+    
+    if options["daemon"] and not _in_daemon and positional:
+        status = run_in_daemon(options["daemon_socket"] or default_socket_path(), args, os.getcwd())
+        if status is not None:
+            sys.exit(status)
+        print("⚠ No build daemon is listening; building in this process", file=sys.stderr)
+    
+    if len(positional) < 1:
+        print("Usage: python build_site.py <vault_dir> [output_dir] [theme_name] [options]")
+        print("Options:")
+        print(BUILD_OPTIONS_HELP)
         print("Available themes:")
         script_dir = Path(__file__).parent
         themes = list_available_themes(script_dir)
@@ -321,42 +1017,113 @@ def main():
         sys.exit(1)
     
     # Parse arguments
-    vault_path = sys.argv[1]
+    vault_path = positional[0]
     script_dir = Path(__file__).parent
     
     # Default output to Outputs directory if not specified
-    if len(sys.argv) >= 3 and not sys.argv[2].startswith('--'):
-        output_path = sys.argv[2]
-        theme_name = sys.argv[3] if len(sys.argv) > 3 else "paper-theme"
+    if len(positional) >= 2:
+        output_path = positional[1]
+        theme_name = positional[2] if len(positional) > 2 else "paper-theme"
     else:
         # Create default output path in Outputs directory
         vault_name = Path(vault_path).name.replace(' ', '_')
         output_path = str(script_dir / "Outputs" / vault_name)
-        theme_name = sys.argv[2] if len(sys.argv) > 2 else "paper-theme"
+        theme_name = "paper-theme"
     
     vault, out = map(lambda p: Path(p).expanduser().resolve(), [vault_path, output_path])
-    script_dir = Path(__file__).parent
+    
+    if options["search"] and options["shard"]:
+        print("--search can't be combined with --shard: every shard would index only its own pages")
+        sys.exit(1)
     
     if not vault.is_dir(): 
         print("Vault not found")
         sys.exit(1)
     
-    # Create output directory
-    if out.exists(): 
-        shutil.rmtree(out)
-    out.mkdir(parents=True)
+    profiler = None
+    if options["profile"]:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
     
-    # Copy theme
-    if not copy_theme(script_dir, out, theme_name):
-        sys.exit(1)
+    # Build into a staging directory; the previous output stays live until it is complete.
+    # Only files whose content changed are written.
+    timings = BuildTimings()
+    stage = begin_stage(out)
+    fingerprint = Fingerprinter() if options["fingerprint"] else None
+    writer = OutputWriter(stage, minify=options["minify"], fingerprint=fingerprint)
+    try:
+        # One walk over the vault serves both the assets and the notes
+        with timings.stage("scan"):
+            snapshot = scan_vault(vault, open_vault_snapshot(options, script_dir, vault))
+        
+        # Assets first: with fingerprinting, the theme and pages refer to their hashed names
+        with timings.stage("assets"):
+            copy_assets(vault, writer, snapshot)
+        
+        # Copy theme
+        with timings.stage("theme"):
+            if not copy_theme(script_dir, writer, theme_name):
+                discard_stage(out)
+                sys.exit(1)
+        
+        # Build site
+        cache = open_render_cache(options, script_dir)
+        use_highlight_cache(open_highlight_cache(options, script_dir))
+        links = {} if options["check_links"] else None
+        pages, vault_index_file, link_index = build_notes(vault, writer, jobs=options["jobs"], cache=cache,
+                                                          nav=options["nav"], timings=timings, shard=options["shard"],
+                                                          search=options["search_memory"] if options["search"] else None,
+                                                          snapshot=snapshot, links=links, backlinks=options["backlinks"])
+        if links is not None:
+            with timings.stage("links"):
+                problems = link_report(vault, broken_links(links, link_index), link_index.collisions())
+            if problems:
+                print("\n".join(problems))
+                print(f"✗ {len(problems)} link problem(s); the previous output is left in place")
+                discard_stage(out)
+                sys.exit(1)
+            print("✓ All wikilinks resolve")
+        with timings.stage("index"):
+            generated = datetime.date.today() if options["stamp_date"] else None
+            write_index(pages, vault_index_file, writer, options["nav"], generated, options["search"])
+            if fingerprint:
+                fingerprint.write_manifest(writer)
+        if options["precompress"]:
+            with timings.stage("compress"):
+                precompress(writer, resolve_jobs(0))
+        if options["deploy_manifest"]:
+            with timings.stage("manifest"):
+                try:
+                    previous = load_manifest(writer.path(MANIFEST_NAME))
+                except (OSError, ValueError, KeyError):
+                    previous = None
+                write_manifest(writer, previous)
+        writer.prune()
+    except BaseException:
+        discard_stage(out)
+        raise
+    with timings.stage("publish"):
+        publish(stage, out, writer.changed)
+        if cache:
+            cache.evict()
+        _highlight_cache.evict()
+        snapshot.save()
+    timings.finish()
     
-    # Build site
-    pages, vault_index_file = build_notes(vault, out)
-    copy_assets(vault, out)
-    write_index(pages, vault_index_file, out)
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(options["profile"])
     
     print(f"✓ Site exported to {out}")
     print(f"✓ Using theme: {theme_name}")
+    if options["timings"]:
+        print(timings.report())
+    if options["timings_json"]:
+        timings.write_json(options["timings_json"])
+        print(f"✓ Timings written to {options['timings_json']}")
+    if profiler:
+        print(f"✓ Profile written to {options['profile']}")
 
 if __name__=="__main__":
     main()
@@ -0,0 +1,117 @@
+"""
+Per-stage build timings.
+
+A BuildTimings object is threaded through a build. Stages are measured with
+``with timings.stage("name"):`` (repeated stages accumulate), rendered notes
+are recorded with ``timings.note(...)``, and the result can be printed as a
+report or written as JSON for CI dashboards.
+"""
+
+import sys
+import json
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_memory_bytes():
+    """Return the peak resident set size of this process and its children, if known"""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class BuildTimings:
+    """Collects wall/CPU time per stage and render time per note for one build"""
+
+    def __init__(self):
+        self.stages = {}  # name → [wall seconds, cpu seconds]
+        self.notes = []   # (render seconds, highlight seconds, html bytes, name)
+        self.cached = 0   # notes served from the render cache
+        self.started = time.perf_counter()
+        self.total = None
+
+    @contextmanager
+    def stage(self, name):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            spent = self.stages.setdefault(name, [0.0, 0.0])
+            spent[0] += time.perf_counter() - wall
+            spent[1] += time.process_time() - cpu
+
+    def iterate(self, name, iterable):
+        """Yield from `iterable`, charging the time spent producing each item to stage `name`"""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def note(self, name, seconds, highlight_seconds, size):
+        self.notes.append((seconds, highlight_seconds, size, str(name)))
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+        return self
+
+    def slowest(self, count=10):
+        return sorted(self.notes, reverse=True)[:count]
+
+    def to_json(self, slowest=10) -> dict:
+        total = self.total if self.total is not None else time.perf_counter() - self.started
+        return {
+            "total_seconds": total,
+            "stages": {name: {"wall_seconds": wall, "cpu_seconds": cpu} for name, (wall, cpu) in self.stages.items()},
+            "notes": {
+                "count": len(self.notes),
+                "cached": self.cached,
+                "render_seconds": sum(note[0] for note in self.notes),
+                "highlight_seconds": sum(note[1] for note in self.notes),
+            },
+            "slowest_notes": [
+                {"note": name, "render_seconds": seconds, "highlight_seconds": highlight, "html_bytes": size}
+                for seconds, highlight, size, name in self.slowest(slowest)
+            ],
+            "peak_memory_bytes": peak_memory_bytes(),
+        }
+
+    def write_json(self, path, slowest=10):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(slowest), f, indent=2)
+            f.write("\n")
+
+    def summary(self) -> str:
+        """One line: total time and each stage's wall time"""
+        data = self.to_json()
+        stages = " · ".join(f"{name} {info['wall_seconds'] * 1000:.0f}" for name, info in data["stages"].items())
+        return f"{data['total_seconds'] * 1000:.0f} ms ({stages} ms)"
+
+    def report(self, slowest=10) -> str:
+        data = self.to_json(slowest)
+        lines = ["Build timings", f"  {'stage':<14} {'wall ms':>10} {'cpu ms':>10}"]
+        for name, info in data["stages"].items():
+            lines.append(f"  {name:<14} {info['wall_seconds'] * 1000:10.1f} {info['cpu_seconds'] * 1000:10.1f}")
+        lines.append(f"  {'total':<14} {data['total_seconds'] * 1000:10.1f}")
+
+        notes = data["notes"]
+        lines.append(f"Rendered {notes['count']} note(s), {notes['cached']} from cache: md.convert {notes['render_seconds'] * 1000:.1f} ms, "
+                     f"of which Pygments {notes['highlight_seconds'] * 1000:.1f} ms (summed over workers)")
+        if data["slowest_notes"]:
+            lines.append("Slowest notes:")
+            for note in data["slowest_notes"]:
+                lines.append(f"  {note['render_seconds'] * 1000:8.1f} ms {note['html_bytes']:>9} B  {note['note']}")
+        if data["peak_memory_bytes"] is not None:
+            lines.append(f"Peak memory: {data['peak_memory_bytes'] / (1024 * 1024):.1f} MiB")
+        return "\n".join(lines)
@@ -0,0 +1,58 @@
+"""
+Deterministic deploy manifests.
+
+A manifest lists every output file with its size and SHA-256, and nothing
+that varies between identical builds (no timestamps), so two builds of the
+same vault produce the same manifest. ``diff_manifests`` compares two
+manifests, which lets an uploader push only the files that were added or
+changed and delete the removed ones.
+"""
+
+import json
+import hashlib
+
+MANIFEST_NAME = "deploy-manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_digest(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(path) -> dict:
+    """Return the {path: {"size", "sha256"}} entries of a manifest file"""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["files"]
+
+
+def write_manifest(out, previous=None):
+    """Write the manifest of everything an OutputWriter produced into its output.
+
+    Files the build did not change keep their entry from `previous` (the last
+    published manifest), so only changed files are hashed.
+    """
+    previous = previous or {}
+    files = {}
+    for rel in sorted(out.produced):
+        if rel == MANIFEST_NAME:
+            continue
+        entry = previous.get(rel)
+        if entry is None or rel in out.changed:
+            entry = {"size": out.path(rel).stat().st_size, "sha256": file_digest(out.path(rel))}
+        files[rel] = entry
+    manifest = {"version": MANIFEST_VERSION, "files": files}
+    out.write_bytes(MANIFEST_NAME, (json.dumps(manifest, indent=1, sort_keys=True) + "\n").encode("utf-8"))
+    return files
+
+
+def diff_manifests(old:dict, new:dict) -> dict:
+    """Return the sorted paths added, changed and removed between two manifests"""
+    return {
+        "added": sorted(set(new) - set(old)),
+        "changed": sorted(rel for rel in set(old) & set(new) if old[rel] != new[rel]),
+        "removed": sorted(set(old) - set(new)),
+    }
@@ -0,0 +1,169 @@
+"""
+Output post-processing: minification, precompression and fingerprinting.
+
+``minify_html`` and ``minify_css`` are conservative. They drop comments and
+redundant whitespace but never touch ``<pre>``, ``<textarea>``, ``<script>``
+or ``<style>`` contents, or CSS strings. ``precompress`` writes ``.gz`` (and
+``.br`` when the brotli module is installed) siblings for changed files so
+static hosts can serve them without compressing on every request.
+``Fingerprinter`` names assets after their content hash and rewrites the
+references to them, so hosts can cache everything except HTML forever.
+"""
+
+import re
+import json
+import gzip
+import hashlib
+import posixpath
+import urllib.parse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_SUFFIXES = (".html", ".css", ".js", ".json", ".svg", ".txt", ".xml")
+
+# ── HTML ──────────────────────────────────────────────────────────────────────
+HTML_RAW_RE = re.compile(r"(<(pre|textarea|script|style)\b.*?</\2\s*>)", re.S | re.I)
+HTML_COMMENT_RE = re.compile(r"<!--(?!\[if).*?-->", re.S)
+WHITESPACE_RE = re.compile(r"\s+")
+BLOCK_TAGS = ("html|head|body|title|meta|link|nav|article|section|header|footer|main|div|p|ul|ol|li|"
+              "table|thead|tbody|tr|th|td|h[1-6]|hr|br|blockquote|figure|figcaption|noscript|details|summary")
+# Whitespace next to a block-level tag never renders
+BLOCK_GAP_RE = re.compile(rf"\s*(</?(?:{BLOCK_TAGS})\b[^>]*>)\s*", re.I)
+
+def minify_html(html:str) -> str:
+    parts = HTML_RAW_RE.split(html)
+    out = []
+    # split() yields text, raw block, tag name, text, ...
+    for i in range(0, len(parts), 3):
+        text = HTML_COMMENT_RE.sub("", parts[i])
+        text = WHITESPACE_RE.sub(" ", text)
+        out.append(BLOCK_GAP_RE.sub(r"\1", text))
+        if i + 1 < len(parts):
+            out.append(parts[i + 1])
+    return "".join(out).strip()
+
+# ── CSS ───────────────────────────────────────────────────────────────────────
+CSS_TOKEN_RE = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|/\*.*?\*/""", re.S)
+CSS_SPACE_RE = re.compile(r"\s*([{};,>])\s*|(:)\s+")
+
+def minify_css(css:str) -> str:
+    out = []
+    pos = 0
+    for match in CSS_TOKEN_RE.finditer(css):
+        out.append(_squeeze_css(css[pos:match.start()]))
+        if match.group(1):
+            out.append(match.group(1))  # Strings are kept verbatim; comments are dropped
+        pos = match.end()
+    out.append(_squeeze_css(css[pos:]))
+    return "".join(out).replace(";}", "}").strip()
+
+def _squeeze_css(css:str) -> str:
+    css = WHITESPACE_RE.sub(" ", css)
+    return CSS_SPACE_RE.sub(lambda m: m.group(1) or m.group(2), css)
+
+def minify(rel:str, text:str) -> str:
+    """Minify output text by file type; other files pass through unchanged"""
+    if rel.endswith(".html"):
+        return minify_html(text)
+    if rel.endswith(".css"):
+        return minify_css(text)
+    return text
+
+# ── precompression ────────────────────────────────────────────────────────────
+def _compress(data:bytes):
+    yield ".gz", gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield ".br", brotli.compress(data, quality=11)
+
+def precompress(out, jobs=4):
+    """Write compressed siblings for every compressible file an OutputWriter produced.
+
+    Only files whose content changed (or that lack a sibling) are compressed;
+    the siblings of unchanged files are kept. Returns the number compressed.
+    """
+    suffixes = [".gz"] + ([".br"] if brotli is not None else [])
+    to_compress = []
+    for rel in list(out.produced):
+        if not rel.endswith(COMPRESSIBLE_SUFFIXES):
+            continue
+        if rel in out.changed or not all(out.path(rel + suffix).exists() for suffix in suffixes):
+            to_compress.append(rel)
+        else:
+            out.produced.update(rel + suffix for suffix in suffixes)
+
+    def compress(rel):
+        for suffix, data in _compress(out.path(rel).read_bytes()):
+            out.write_bytes(rel + suffix, data)
+
+    # zlib and brotli release the GIL, so threads compress in parallel
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        list(pool.map(compress, to_compress))
+    return len(to_compress)
+
+# ── fingerprinting ────────────────────────────────────────────────────────────
+URL_ATTR_RE = re.compile(r"""(\b(?:href|src)\s*=\s*)(["'])(.*?)\2""", re.I)
+CSS_URL_RE = re.compile(r"""(url\(\s*)(["']?)([^"')]+)\2""", re.I)
+MANIFEST_NAME = "asset-manifest.json"
+# Fetched by these names at the site root by hosts, browsers and crawlers, so never renamed
+FIXED_NAMES = {"CNAME", ".nojekyll", "_headers", "_redirects", "favicon.ico", "apple-touch-icon.png",
+               "robots.txt", "humans.txt", "ads.txt", "sitemap.xml", "site.webmanifest", "manifest.webmanifest",
+               "browserconfig.xml", "feed.xml", "atom.xml", "rss.xml", MANIFEST_NAME}
+
+class Fingerprinter:
+    """Renames assets to ``name.<hash>.ext`` and rewrites references to them.
+
+    Assets must be added before the pages and stylesheets that reference them
+    are rewritten. `manifest` maps original output paths to fingerprinted ones.
+    """
+
+    def __init__(self):
+        self.manifest = {}
+
+    @staticmethod
+    def applies_to(rel:str) -> bool:
+        """Check if `rel` is renamed: everything but HTML pages and files fetched by a fixed name"""
+        return not rel.endswith(".html") and rel not in FIXED_NAMES and not rel.startswith(".well-known/")
+
+    def add(self, rel:str, digest:str) -> str:
+        """Record the fingerprinted name of `rel` for content with hex `digest`"""
+        directory, name = posixpath.split(rel)
+        stem, dot, suffix = name.rpartition(".")
+        name = f"{stem}.{digest[:12]}.{suffix}" if dot and stem else f"{name}.{digest[:12]}"
+        self.manifest[rel] = posixpath.join(directory, name)
+        return self.manifest[rel]
+
+    def add_bytes(self, rel:str, data:bytes) -> str:
+        return self.add(rel, hashlib.sha256(data).hexdigest())
+
+    def add_file(self, rel:str, path) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return self.add(rel, digest.hexdigest())
+
+    def rewrite(self, rel:str, text:str) -> str:
+        """Point asset references in the HTML or CSS file `rel` at the fingerprinted names"""
+        pattern = CSS_URL_RE if rel.endswith(".css") else URL_ATTR_RE
+        base = posixpath.dirname(rel)
+        return pattern.sub(lambda m: m.group(1) + m.group(2) + self._url(base, m.group(3)) + m.group(2), text)
+
+    def _url(self, base:str, url:str) -> str:
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme or parts.netloc or not parts.path:
+            return url
+        path = urllib.parse.unquote(parts.path)
+        target = posixpath.normpath(path.lstrip("/") if path.startswith("/") else posixpath.join(base, path))
+        fingerprinted = self.manifest.get(target)
+        if fingerprinted is None:
+            return url
+        prefix = parts.path[:parts.path.rfind("/") + 1]
+        new_path = prefix + urllib.parse.quote(posixpath.basename(fingerprinted))
+        return urllib.parse.urlunsplit(parts._replace(path=new_path))
+
+    def write_manifest(self, out):
+        out.write_bytes(MANIFEST_NAME, (json.dumps(self.manifest, indent=2, sort_keys=True) + "\n").encode("utf-8"))
@@ -0,0 +1,132 @@
+"""
+Persistent on-disk cache for rendered notes and highlighted code blocks.
+
+Entries are small JSON files stored under a cache directory (``.ssg-cache/``
+by default) and addressed by a SHA-256 of the note's preprocessed text plus a
+salt describing the render pipeline (generator version, Markdown extensions,
+library versions). Changing any of those simply misses the cache.
+
+The cache is size bounded: ``evict()`` drops the least recently used entries
+(by mtime, refreshed on every hit) until the directory fits in ``max_bytes``.
+
+``HighlightCache`` memoizes single code blocks: an in-memory LRU in front of an
+optional ``RenderCache`` directory, so a snippet that did not change is only
+highlighted again when both have forgotten it.
+"""
+
+import os
+import json
+import hashlib
+from collections import OrderedDict
+from pathlib import Path
+
+DEFAULT_CACHE_SIZE_MB = 512
+DEFAULT_HIGHLIGHT_ENTRIES = 4096
+
+
+class RenderCache:
+    """Content-addressed store mapping note text to rendered HTML and metadata"""
+
+    def __init__(self, root, salt="", max_bytes=DEFAULT_CACHE_SIZE_MB * 1024 * 1024):
+        self.root = Path(root)
+        self.salt = salt
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text:str) -> str:
+        """Return the cache key for a note's preprocessed text"""
+        digest = hashlib.sha256(self.salt.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path(self, key:str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key:str):
+        """Return the cached entry for `key`, or None on a miss"""
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        # Refresh mtime so eviction keeps recently used entries
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return entry
+
+    def put(self, key:str, entry:dict):
+        """Store `entry` under `key`; failures only cost a future cache miss"""
+        path = self._path(key)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for path in self.root.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        removed = 0
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+
+class HighlightCache:
+    """Maps a code block's highlighting inputs (language, code, formatter options) to its HTML"""
+    
+    def __init__(self, max_entries=DEFAULT_HIGHLIGHT_ENTRIES, disk:RenderCache=None):
+        self.max_entries = max_entries
+        self.disk = disk
+        self.memory = OrderedDict()
+    
+    def __getstate__(self):
+        # Render workers receive a copy; the in-memory entries stay behind
+        return {"max_entries": self.max_entries, "disk": self.disk, "memory": OrderedDict()}
+    
+    def lookup(self, inputs:str, highlight):
+        """Return the HTML cached for `inputs`, calling highlight() to produce it on a miss"""
+        html = self.memory.get(inputs)
+        if html is not None:
+            self.memory.move_to_end(inputs)
+            return html
+        
+        key = self.disk.key(inputs) if self.disk else None
+        entry = self.disk.get(key) if self.disk else None
+        if entry is not None:
+            html = entry["html"]
+        else:
+            html = highlight()
+            if self.disk:
+                self.disk.put(key, {"html": html})
+        
+        self.memory[inputs] = html
+        if len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+        return html
+    
+    def evict(self):
+        """Trim the on-disk store, if any, to its size limit"""
+        return self.disk.evict() if self.disk else 0
@@ -0,0 +1,187 @@
+"""
+Client-side search index.
+
+``SearchIndexBuilder`` collects an inverted index while pages are rendered
+and writes it as static files under ``search/``:
+
+    search/pages.json    [[url, title], ...]; a page id is its position
+    search/<ab>.json     {term: [id, weight, id delta, weight, ...]} for every
+                         term starting with the two characters "ab"
+
+Ids in a posting list are sorted and delta encoded, and the weight is the
+term's count in the page plus a bonus for title words. The browser only
+fetches the shards for the prefixes of the words it searches for.
+
+Memory is bounded: when the in-memory postings exceed the budget, they are
+spilled to per-prefix run files and merged one shard at a time at the end.
+"""
+
+import os
+import re
+import json
+import html
+import unicodedata
+
+TOKEN_RE = re.compile(r"[a-z0-9]{2,}")
+TAG_RE = re.compile(r"<[^>]+>")
+PREFIX_LENGTH = 2
+TITLE_WEIGHT = 10
+POSTING_BYTES = 120  # rough in-memory cost of one posting, for the memory budget
+DEFAULT_SEARCH_MEMORY_MB = 64
+
+def tokenize(text:str):
+    """Fold to lowercase ASCII and split into words of two or more letters or digits"""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+    return TOKEN_RE.findall(text)
+
+def html_text(page_html:str) -> str:
+    return html.unescape(TAG_RE.sub(" ", page_html))
+
+
+class SearchIndexBuilder:
+    """Builds the search index for `pages`, a list of (url, title) in page id order"""
+
+    def __init__(self, pages, memory_mb=DEFAULT_SEARCH_MEMORY_MB):
+        self.pages = list(pages)
+        self.ids = {url: i for i, (url, title) in enumerate(self.pages)}
+        self.max_postings = max(1, memory_mb * 1024 * 1024 // POSTING_BYTES)
+        self.postings = {}  # term → {page id: weight}
+        self.size = 0
+        self.spill_dir = None
+        self.spilled_prefixes = set()
+
+    def add(self, url:str, article_html:str):
+        """Index a rendered page; pages not in `pages` (e.g. drafts) are ignored"""
+        page_id = self.ids.get(url)
+        if page_id is None:
+            return
+        weights = {}
+        for term in tokenize(self.pages[page_id][1]):
+            weights[term] = weights.get(term, 0) + TITLE_WEIGHT
+        for term in tokenize(html_text(article_html)):
+            weights[term] = weights.get(term, 0) + 1
+
+        for term, weight in weights.items():
+            postings = self.postings.setdefault(term, {})
+            self.size += page_id not in postings
+            postings[page_id] = postings.get(page_id, 0) + weight
+        if self.size > self.max_postings:
+            self._spill()
+
+    def _spill(self):
+        """Append the in-memory postings to per-prefix run files and start over"""
+        if self.spill_dir is None:
+            import tempfile
+            self.spill_dir = tempfile.TemporaryDirectory(prefix="ssg-search-")
+        by_prefix = {}
+        for term, postings in self.postings.items():
+            by_prefix.setdefault(term[:PREFIX_LENGTH], []).append((term, postings))
+        for prefix, entries in by_prefix.items():
+            with open(os.path.join(self.spill_dir.name, prefix), "a", encoding="utf-8") as f:
+                for term, postings in entries:
+                    f.write(json.dumps([term, postings]) + "\n")
+            self.spilled_prefixes.add(prefix)
+        self.postings = {}
+        self.size = 0
+
+    def _shard(self, prefix, in_memory):
+        """Merge the spilled runs and in-memory postings of one prefix"""
+        merged = {}
+        if prefix in self.spilled_prefixes:
+            with open(os.path.join(self.spill_dir.name, prefix), encoding="utf-8") as f:
+                for line in f:
+                    term, postings = json.loads(line)
+                    target = merged.setdefault(term, {})
+                    for page_id, weight in postings.items():
+                        target[int(page_id)] = target.get(int(page_id), 0) + weight
+        for term, postings in in_memory:
+            target = merged.setdefault(term, {})
+            for page_id, weight in postings.items():
+                target[page_id] = target.get(page_id, 0) + weight
+        return merged
+
+    def write(self, out):
+        """Write pages.json and one file per term prefix through an OutputWriter"""
+        # Written as bytes: the browser fetches these by name, so they are never fingerprinted
+        out.write_bytes("search/pages.json", json.dumps(self.pages, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+        in_memory = {}
+        for term, postings in self.postings.items():
+            in_memory.setdefault(term[:PREFIX_LENGTH], []).append((term, postings))
+        self.postings = {}
+
+        for prefix in sorted(set(in_memory) | self.spilled_prefixes):
+            shard = {}
+            for term, postings in sorted(self._shard(prefix, in_memory.pop(prefix, ())).items()):
+                encoded, previous = [], 0
+                for page_id in sorted(postings):
+                    encoded += [page_id - previous, postings[page_id]]
+                    previous = page_id
+                shard[term] = encoded
+            out.write_bytes(f"search/{prefix}.json", json.dumps(shard, separators=(",", ":")).encode("utf-8"))
+
+        if self.spill_dir is not None:
+            self.spill_dir.cleanup()
+            self.spill_dir = None
+            self.spilled_prefixes = set()
+
+
+# ── search page ───────────────────────────────────────────────────────────────
+SEARCH_PAGE = "search/index.html"  # claimed before notes are rendered; a note named "Search" can't overwrite it
+SEARCH_PAGE_HTML = """<h1>Search</h1>
+<form class='search-form' role='search' onsubmit='return false'>
+<input type='search' id='search-input' placeholder='Search notes…' autocomplete='off' autofocus>
+</form>
+<ol id='search-results' class='search-results'></ol>
+<script src='search.js'></script>"""
+
+SEARCH_CSS = """.search-form input { width: 100%; padding: 10px 12px; font: inherit; color: var(--ink); background: var(--paper); border: 1px solid var(--faint); border-radius: 4px; }
+.search-results li { margin: 8px 0; }
+"""
+
+SEARCH_SCRIPT = r"""(function () {
+  var input = document.getElementById('search-input'), list = document.getElementById('search-results');
+  var shards = {}, pages = null;
+  function load(url) { return fetch(url).then(function (r) { return r.ok ? r.json() : {}; }); }
+  function tokens(text) {
+    return (text.normalize('NFKD').replace(/[\u0300-\u036f]/g, '').toLowerCase().match(/[a-z0-9]{2,}/g) || []);
+  }
+  function shard(prefix) { return shards[prefix] || (shards[prefix] = load(prefix + '.json')); }
+  function postings(term) {
+    // Every indexed term starting with the query word, so results update while typing
+    return shard(term.slice(0, PREFIX_LENGTH)).then(function (index) {
+      var scores = {};
+      Object.keys(index).forEach(function (key) {
+        if (key.lastIndexOf(term, 0) !== 0) return;
+        var list = index[key], id = 0;
+        for (var i = 0; i < list.length; i += 2) { id += list[i]; scores[id] = (scores[id] || 0) + list[i + 1]; }
+      });
+      return scores;
+    });
+  }
+  function search() {
+    var query = input.value, terms = tokens(query);
+    if (!terms.length) { list.innerHTML = ''; return; }
+    Promise.all([pages || (pages = load('pages.json'))].concat(terms.map(postings))).then(function (results) {
+      if (input.value !== query) return;
+      var all = results[0], total = results[1];
+      results.slice(2).forEach(function (scores) {
+        Object.keys(total).forEach(function (id) { if (!(id in scores)) delete total[id]; else total[id] += scores[id]; });
+      });
+      var ids = Object.keys(total).sort(function (a, b) { return total[b] - total[a]; }).slice(0, 50);
+      list.innerHTML = '';
+      ids.forEach(function (id) {
+        var li = document.createElement('li'), a = document.createElement('a');
+        a.href = '../' + all[id][0];
+        a.textContent = all[id][1];
+        li.appendChild(a);
+        list.appendChild(li);
+      });
+      if (!ids.length) list.innerHTML = '<li class="search-empty">No results</li>';
+    });
+  }
+  input.addEventListener('input', search);
+  var initial = new URLSearchParams(location.search).get('q');
+  if (initial) { input.value = initial; search(); }
+})();
+""".replace("PREFIX_LENGTH", str(PREFIX_LENGTH))
@@ -5,41 +5,112 @@ Live development server for Obsidian Static Site Generator
 This server watches for file changes in your vault and automatically rebuilds
 the site, then serves it on a local web server for immediate preview.
 
-Usage: python serve.py <vault_dir> [theme_name] [--port PORT] [--host HOST]
+Usage: python serve.py <vault_dir> [theme_name] [--port PORT] [--host HOST] [--lazy | --warm] [build options]
 """
 
+import io
+import os
 import sys
+import gzip
+import json
+import hashlib
 import time
+import queue
 import threading
 import http.server
-import socketserver
 import functools
+import email.utils
+import urllib.parse
+from collections import OrderedDict
 from pathlib import Path
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
-import webbrowser
-import subprocess
-import shutil
 
 # Import the build functions from build_site.py
 try:
-    from build_site import build_notes, copy_assets, write_index, copy_theme, list_available_themes
+    from site_output import OutputWriter, begin_stage, discard_stage, publish
+    from build_timings import BuildTimings
+    from postprocess import minify_html
+    from wikilinks import LinkIndex, LinkGraph, GRAPH_NAME, link_key, broken_links, link_report, backlinks_html
+    from build_site import (read_note, resolve_note, index_note, link_index, graph_note, new_transcluder, page_url, is_note,
+                            is_asset, index_pages, navigation_by_depth, write_navigation_script, render_articles,
+                            write_page, render_page, page_depth, page_output_path, new_markdown, copy_asset, copy_assets,
+                            write_index, copy_theme, list_available_themes, default_build_options, parse_build_option, open_render_cache,
+                            open_highlight_cache, use_highlight_cache, open_vault_snapshot, scan_vault, BUILD_OPTIONS_HELP)
 except ImportError:
     print("Error: Could not import build_site.py functions")
     print("Make sure build_site.py is in the same directory as serve.py")
     sys.exit(1)
 
 
-class BuildHandler(FileSystemEventHandler):
-    """Handles file system events and triggers rebuilds"""
+class BuildScheduler:
+    """Runs builds on a single worker thread, coalescing changes instead of dropping them.
     
-    def __init__(self, vault_path, output_path, theme_name, build_callback):
+    Changed paths are collected until no new change has arrived for `debounce`
+    seconds (or `max_delay` seconds have passed since the first one), then handed
+    to `build_callback` as one set. Changes arriving while a build runs become the
+    next batch, superseding any earlier pending one, so two builds never overlap.
+    """
+    
+    def __init__(self, build_callback, debounce=0.3, max_delay=2.0):
+        self.build_callback = build_callback
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._pending = set()
+        self._first_change = None
+        self._last_change = None
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="build-scheduler", daemon=True)
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join()
+    
+    def submit(self, paths):
+        """Queue changed paths for the next build"""
+        with self._cond:
+            now = time.monotonic()
+            if not self._pending:
+                self._first_change = now
+            self._pending.update(str(path) for path in paths)
+            self._last_change = now
+            self._cond.notify()
+    
+    def _due(self):
+        return min(self._last_change + self.debounce, self._first_change + self.max_delay)
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped and (not self._pending or time.monotonic() < self._due()):
+                    self._cond.wait(self._due() - time.monotonic() if self._pending else None)
+                if self._stopped:
+                    return
+                changed, self._pending = self._pending, set()
+            
+            # Build outside the lock so new changes queue up for the next batch
+            try:
+                self.build_callback(changed)
+            except Exception as e:
+                print(f"❌ Build failed: {e}")
+
+
+class BuildHandler:
+    """Handles file system events and queues the changed paths for a rebuild.
+    
+    Watchdog only calls dispatch(), so this doesn't subclass its
+    FileSystemEventHandler and watchdog is imported when watching starts.
+    """
+    
+    def __init__(self, vault_path, output_path, theme_name, scheduler):
         self.vault_path = Path(vault_path).resolve()
         self.output_path = Path(output_path).resolve()
         self.theme_name = theme_name
-        self.build_callback = build_callback
-        self.last_build_time = 0
-        self.build_delay = 1.0  # Minimum seconds between builds
+        self.scheduler = scheduler
         
     def should_rebuild(self, file_path):
         """Check if file change should trigger a rebuild"""
@@ -49,15 +120,13 @@ class BuildHandler(FileSystemEventHandler):
         if any(part.startswith('.') for part in file_path.parts):
             return False
             
-        # Only rebuild for markdown files in vault or theme files
-        if file_path.suffix == '.md':
-            # Check if the file is within the vault directory
-            try:
-                file_path.relative_to(self.vault_path)
-                return True
-            except ValueError:
-                # File is not within vault directory
-                return False
+        # Rebuild for any file in the vault (notes and assets) or theme files
+        try:
+            file_path.relative_to(self.vault_path)
+            return True
+        except ValueError:
+            # File is not within vault directory
+            pass
         if file_path.suffix == '.css' and 'Themes' in str(file_path):
             return True
         if file_path.name in ['build_site.py', 'serve.py']:
@@ -65,118 +134,709 @@ class BuildHandler(FileSystemEventHandler):
             
         return False
     
+    def schedule(self, *paths):
+        self.scheduler.submit(paths)
+    
+    def dispatch(self, event):
+        handler = getattr(self, f"on_{event.event_type}", None)
+        if handler:
+            handler(event)
+    
     def on_modified(self, event):
         if event.is_directory:
             return
             
-        # Throttle rebuilds to avoid excessive builds
-        current_time = time.time()
-        if current_time - self.last_build_time < self.build_delay:
-            return
-            
         if self.should_rebuild(event.src_path):
             print(f"\n🔄 File changed: {Path(event.src_path).name}")
-            self.last_build_time = current_time
-            # Use a timer to debounce rapid file changes
-            if hasattr(self, '_timer'):
-                self._timer.cancel()
-            self._timer = threading.Timer(0.5, self.build_callback)
-            self._timer.start()
+            self.schedule(event.src_path)
     
     def on_created(self, event):
-        self.on_modified(event)
+        # A new directory may arrive with files that produce no events of their own
+        if event.is_directory and self.should_rebuild(event.src_path):
+            self.schedule(event.src_path)
+        else:
+            self.on_modified(event)
     
     def on_deleted(self, event):
-        if not event.is_directory and self.should_rebuild(event.src_path):
+        if self.should_rebuild(event.src_path):
             print(f"\n🗑️  File deleted: {Path(event.src_path).name}")
-            if hasattr(self, '_timer'):
-                self._timer.cancel()
-            self._timer = threading.Timer(0.5, self.build_callback)
-            self._timer.start()
+            self.schedule(event.src_path)
+    
+    def on_moved(self, event):
+        paths = [path for path in (event.src_path, event.dest_path) if self.should_rebuild(path)]
+        if paths:
+            print(f"\n🔀 File moved: {Path(event.src_path).name} → {Path(event.dest_path).name}")
+            self.schedule(*paths)
+
+
+class CompressedResponseCache:
+    """Keeps gzip-compressed copies of recently served files, bounded to `max_bytes`.
+    
+    Entries are keyed by output path and ETag, so a stale entry is never
+    served; invalidate() frees the entries of files a build changed.
+    """
+    
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()  # (rel path, etag) → gzip bytes
+        self.lock = threading.Lock()
+    
+    def get(self, rel, etag, read):
+        """Return the gzip-compressed content of `rel`, calling read() for the raw bytes on a miss"""
+        key = (rel, etag)
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+                return data
+        
+        data = gzip.compress(read(), compresslevel=6, mtime=0)
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = data
+                self.size += len(data)
+            while self.size > self.max_bytes and self.entries:
+                self.size -= len(self.entries.popitem(last=False)[1])
+        return data
+    
+    def invalidate(self, changed=None):
+        """Drop entries for the changed output paths (all entries when `changed` is None)"""
+        with self.lock:
+            for key in list(self.entries):
+                if changed is None or key[0] in changed:
+                    self.size -= len(self.entries.pop(key))
+
+
+class LiveReload:
+    """Pushes the URLs changed by each published build to browsers over Server-Sent Events.
+    
+    Pages served by the dev server get LIVE_RELOAD_SCRIPT injected. A tab
+    reloads when its own page, or a script or asset, changed, and swaps
+    stylesheets in place when only CSS changed.
+    """
+    
+    path = "/__livereload"
+    
+    def __init__(self):
+        self.clients = set()
+        self.lock = threading.Lock()
+    
+    def subscribe(self):
+        client = queue.Queue()
+        with self.lock:
+            self.clients.add(client)
+        return client
+    
+    def unsubscribe(self, client):
+        with self.lock:
+            self.clients.discard(client)
+    
+    def notify(self, changed):
+        """Send the URLs of the changed output paths to every connected browser"""
+        urls = sorted({"/" + rel[:-len("index.html")] if rel == "index.html" or rel.endswith("/index.html") else "/" + rel
+                       for rel in changed})
+        if not urls:
+            return
+        message = json.dumps(urls)
+        with self.lock:
+            for client in self.clients:
+                client.put(message)
+
+
+LIVE_RELOAD_SCRIPT = """<script>(function () {
+  var here = location.pathname.replace(/index\\.html$/, '');
+  new EventSource('/__livereload').onmessage = function (event) {
+    var urls = JSON.parse(event.data);
+    if (urls.every(function (url) { return /\\.css$/.test(url); })) {
+      document.querySelectorAll('link[rel=stylesheet]').forEach(function (link) {
+        var url = new URL(link.href);
+        if (urls.indexOf(url.pathname) >= 0) {
+          url.searchParams.set('livereload', Date.now());
+          link.href = url.href;
+        }
+      });
+      return;
+    }
+    if (urls.some(function (url) { return url === here || !/(\\/|\\.html|\\.css)$/.test(url); })) location.reload();
+  };
+})();</script>
+"""
 
 
 class QuietHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
-    """HTTP request handler that doesn't log every request and serves from a specific directory"""
+    """HTTP/1.1 keep-alive handler with ETag validation and gzip, logging only errors"""
     
-    def __init__(self, *args, directory=None, **kwargs):
-        self.serve_directory = directory
+    protocol_version = "HTTP/1.1"
+    compressible_types = ("text/", "application/javascript", "application/json", "image/svg+xml")
+    
+    def __init__(self, *args, response_cache=None, live_reload=None, lazy_site=None, **kwargs):
+        self.response_cache = response_cache
+        self.live_reload = live_reload
+        self.lazy_site = lazy_site  # IncrementalBuilder in lazy mode, rendering pages on request
         super().__init__(*args, **kwargs)
     
-    def translate_path(self, path):
-        """Translate a /-separated PATH to the local filename syntax, serving from our directory"""
-        if self.serve_directory is None:
-            return super().translate_path(path)
+    def do_GET(self):
+        if self.live_reload is not None and self.path == LiveReload.path:
+            self._stream_reloads()
+        else:
+            super().do_GET()
+    
+    def _stream_reloads(self):
+        """Hold the connection open and forward build notifications as server-sent events"""
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        client = self.live_reload.subscribe()
+        try:
+            while True:
+                try:
+                    self.wfile.write(f"data: {client.get(timeout=15)}\n\n".encode("utf-8"))
+                except queue.Empty:
+                    self.wfile.write(b": ping\n\n")  # Notice closed tabs
+                self.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            self.live_reload.unsubscribe(client)
+    
+    def _inject_live_reload(self, html):
+        head, sep, tail = html.rpartition(b"</body>")
+        script = LIVE_RELOAD_SCRIPT.encode("utf-8")
+        return head + script + sep + tail if sep else html + script
+    
+    def send_head(self):
+        if self.lazy_site is not None:
+            served = self._send_lazy_page()
+            if served is not False:
+                return served
+        
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            index = os.path.join(path, "index.html")
+            if not self.path.split('?', 1)[0].endswith('/') or not os.path.isfile(index):
+                # Redirects and directory listings
+                return super().send_head()
+            path = index
         
-        import urllib.parse
-        import posixpath
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+        
+        with f:
+            stat = os.fstat(f.fileno())
+            # Published files are replaced, never modified in place, so size and mtime identify content
+            etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+            rel = os.path.relpath(path, self.directory).replace(os.sep, '/')
+            return self._send_content(rel, self.guess_type(path), etag, f.read, stat.st_mtime)
+    
+    def _send_lazy_page(self):
+        """Serve a page the lazy builder renders on demand; return False if the URL isn't a page"""
+        url_path = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+        rel = url_path.lstrip('/')
+        if rel == "" or rel.endswith('/'):
+            rel += "index.html"
+        elif self.lazy_site.is_page(rel + "/index.html"):
+            self.send_response(301)
+            self.send_header("Location", url_path + "/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
         
-        # Parse the path
-        path = path.split('?', 1)[0]
-        path = path.split('#', 1)[0]
-        path = urllib.parse.unquote(path)
-        path = posixpath.normpath(path)
+        page = self.lazy_site.lazy_page(rel)
+        if page is None:
+            return False
+        etag, html = page
+        return self._send_content(rel, "text/html", etag, lambda: html)
+    
+    def _send_content(self, rel, ctype, etag, read, mtime=None):
+        """Send a 200 (or 304) response for content identified by `etag`, gzipped when possible"""
+        encoding = None
+        if (self.response_cache is not None and "gzip" in self.headers.get("Accept-Encoding", "")
+                and ctype.startswith(self.compressible_types)):
+            encoding = "gzip"
+        # Each encoding is its own representation, so a cached copy of one never validates the other
+        tag = etag[:-1] + '-gz"' if encoding else etag
+        if tag in self.headers.get("If-None-Match", "") or (mtime is not None and self._not_modified_since(mtime)):
+            self.send_response(304)
+            self.send_header("ETag", tag)
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return None
         
-        # Remove leading slash and join with our directory
-        words = path.split('/')
-        words = filter(None, words)
-        path = str(self.serve_directory)
-        for word in words:
-            path = Path(path) / word
+        if self.live_reload is not None and ctype == "text/html":
+            # Only pages served by the dev server get the client; builds stay untouched
+            read_page = read
+            read = lambda: self._inject_live_reload(read_page())
+        if encoding:
+            data = self.response_cache.get(rel, etag, read)
+        else:
+            data = read()
         
-        return str(path)
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        if mtime is not None:
+            self.send_header("Last-Modified", self.date_time_string(mtime))
+        self.send_header("ETag", tag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        return io.BytesIO(data)
+    
+    def _not_modified_since(self, mtime):
+        if "If-None-Match" in self.headers or "If-Modified-Since" not in self.headers:
+            return False
+        try:
+            since = email.utils.parsedate_to_datetime(self.headers["If-Modified-Since"])
+        except (TypeError, ValueError):
+            return False
+        return since is not None and int(mtime) <= since.timestamp()
     
     def log_message(self, format, *args):
         # Only log errors, not every request
-        if args[1] != '200':
+        if args[1] not in ('200', '304'):
             super().log_message(format, *args)
 
 
-def build_site(vault_path, output_path, theme_name):
-    """Build the static site"""
-    try:
-        vault = Path(vault_path).expanduser().resolve()
-        output = Path(output_path).expanduser().resolve()
-        script_dir = Path(__file__).parent
-        
-        if not vault.is_dir():
-            print(f"❌ Vault not found: {vault}")
-            print(f"   Vault path provided: {vault_path}")
-            print(f"   Resolved vault path: {vault}")
+class IncrementalBuilder:
+    """Builds the site once, then re-renders only what a change actually affects.
+    
+    The dependency graph is kept in memory between builds:
+      note file → its page (article HTML is kept, so pages can be re-wrapped cheaply)
+      titles and files → navigation (pages are re-wrapped when their depth's nav changes)
+      wikilink target → notes linking to it (re-resolved when the target's URL changes)
+      page → notes linking to it (with --backlinks; pages are re-wrapped when their backlinks change)
+      embedded note → pages embedding it (re-wrapped, not re-rendered, when it changes)
+      theme → style.css
+    
+    In lazy mode builds only scan notes. Pages are rendered the first time
+    they are requested and kept in an LRU, and changes invalidate the affected
+    pages instead of re-rendering them.
+    """
+    
+    def __init__(self, vault_path, output_path, theme_name, jobs=1, cache=None, nav="inline", options=None):
+        self.vault = Path(vault_path).expanduser().resolve()
+        self.output = Path(output_path).expanduser().resolve()
+        self.theme_name = theme_name
+        self.jobs = jobs
+        self.cache = cache
+        self.nav = nav
+        self.script_dir = Path(__file__).parent
+        self.md = None  # Kept warm for incremental renders
+        self.options = options or default_build_options()  # timings/profile reporting
+        self.profiler = None
+        self.timings = BuildTimings()
+        self.publish_listeners = []  # called with the changed output paths after each publish
+        self.lazy = self.options.get("lazy", False)
+        self.lazy_pages = OrderedDict()  # page output path → (etag, html bytes), most recently used last
+        self.lazy_cache_size = self.options.get("lazy_cache_size", 256)
+        self.lock = threading.RLock()  # builds and on-demand renders never interleave
+        self.snapshot = open_vault_snapshot(self.options, self.script_dir, self.vault)  # kept current by watcher events
+        self.reset()
+    
+    def reset(self):
+        """Forget everything, forcing the next build to be a full one"""
+        self.raw_notes = {}    # note file → note as read, before wikilinks are resolved
+        self.notes = {}        # note file → (title, slug, is_index, parent_dir, file, text)
+        self.articles = {}     # note file → rendered article HTML
+        self.index = LinkIndex(self.vault)  # wikilink target → URL; also decides which note owns a page
+        self.links = {}        # note file → set of wikilink targets
+        self.linked_by = {}    # link key → set of note files linking to it
+        self.graph = LinkGraph(self.index) if self.options.get("backlinks") else None
+        self.backlinks_changed = set()  # page URLs whose backlinks the current build changed
+        self.transcluder = new_transcluder(self.vault, self.index, self.cache)  # keeps rendered embeds
+        self.embeds = {}       # note file → set of note files its page embeds
+        self.embedded_by = {}  # note file → set of note files whose pages embed it
+        self.pages = {}
+        self.vault_index_file = None
+        self.nav_by_depth = {}
+        self.invalidated = set()  # lazy pages dropped by the current build
+        self.lazy_pages.clear()
+    
+    def build(self, changed_paths=None):
+        """Build the site; rebuild fully unless `changed_paths` allows an incremental update"""
+        with self.lock:
+            return self._build(changed_paths)
+    
+    def _build(self, changed_paths):
+        self.invalidated = set()
+        try:
+            if not self.vault.is_dir():
+                print(f"❌ Vault not found: {self.vault}")
+                return False
+            
+            # Write into a staging copy and publish it in one step, so the server
+            # never sees a half-built site and a failed build changes nothing
+            full = changed_paths is None or not self.notes or self._needs_full_build(changed_paths)
+            self._start_profile()
+            self.timings = BuildTimings()
+            with self.timings.stage("stage"):
+                stage = begin_stage(self.output)
+            writer = OutputWriter(stage, minify=self.options["minify"])
+            if full:
+                built = self._full_build(writer)
+            else:
+                built = self._update(writer, changed_paths)
+            
+            if built:
+                with self.timings.stage("publish"):
+                    publish(stage, self.output, writer.changed)
+                for listener in self.publish_listeners:
+                    listener(writer.changed | self.invalidated)
+                self._report(full, writer)
+            else:
+                discard_stage(self.output)
+                self.reset()
+            return built
+            
+        except Exception as e:
+            print(f"❌ Build failed: {e}")
+            import traceback
+            traceback.print_exc()
+            discard_stage(self.output)
+            self.reset()
             return False
+        finally:
+            self._stop_profile()
+    
+    def _needs_full_build(self, changed_paths):
+        # Code changes can't be applied incrementally
+        return any(Path(path).name in ['build_site.py', 'serve.py'] for path in changed_paths)
+    
+    def _full_build(self, out):
+        self.reset()
         
-        # Create output directory
-        if output.exists():
-            shutil.rmtree(output)
-        output.mkdir(parents=True, exist_ok=True)
+        timings = self.timings
         
         # Copy theme
-        if not copy_theme(script_dir, output, theme_name):
-            print(f"❌ Failed to copy theme: {theme_name}")
-            return False
+        with timings.stage("theme"):
+            if not copy_theme(self.script_dir, out, self.theme_name):
+                print(f"❌ Failed to copy theme: {self.theme_name}")
+                return False
         
         # Build site
         print(f"🔨 Building site...")
-        pages, vault_index_file = build_notes(vault, output)
-        copy_assets(vault, output)
-        write_index(pages, vault_index_file, output)
+        with timings.stage("scan"):
+            scan_vault(self.vault, self.snapshot)
+            self.raw_notes = {file: read_note(self.vault, file) for file in self.snapshot.notes()}
+            self.index = link_index(self.vault, self.raw_notes.values(), self.snapshot)
+            self.graph = LinkGraph(self.index) if self.graph else None
+            self.transcluder = new_transcluder(self.vault, self.index, self.cache)
+            for file in self.raw_notes:
+                self._resolve(file)
+            if self.graph:
+                out.write_bytes(GRAPH_NAME, self.graph.to_json().encode("utf-8"))
+        with timings.stage("navigation"):
+            self._refresh_navigation(out)
         
-        print(f"✅ Site built successfully")
-        print(f"📁 Output: {output}")
-        print(f"🎨 Theme: {theme_name}")
+        # Lazy mode stops after the scan; pages are rendered when requested
+        notes = [] if self.lazy else list(self.notes.values())
+        articles = render_articles(notes, self.jobs, self.cache, timings=timings)
+        for note, html in timings.iterate("render", articles):
+            self.articles[note[4]] = html
+            with timings.stage("write"):
+                self._write_page(out, note)
+        with timings.stage("assets"):
+            copy_assets(self.vault, out, self.snapshot)
+        with timings.stage("index"):
+            write_index(self.pages, self.vault_index_file, out, self.nav)
+            out.prune()
+        if self.cache:
+            self.cache.evict()
+        self.snapshot.save()
+        self._check_links()
         return True
+    
+    def _update(self, out, changed_paths):
+        timings = self.timings
+        to_render = set()  # notes whose article HTML changed
+        to_wrap = set()    # notes whose page must be re-wrapped
+        to_resolve = set() # notes whose wikilinks must be resolved again
+        slugs = set()      # slugs whose page may now belong to another note, or to none
+        embedded = set()   # changed notes, whose embeds in other pages must be filled in again
+        changed_keys = set()  # link keys whose URL changed
+        nav_changed = False
+        self.backlinks_changed = set()
         
-    except Exception as e:
-        print(f"❌ Build failed: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+        # First every changed note and asset goes into the link index, so links
+        # resolve against the whole batch
+        with timings.stage("scan"):
+            paths = self._expand(changed_paths)
+        for path in paths:
+            if path.suffix == '.css' and path.parent == self.script_dir / "Themes":
+                if path.stem == self.theme_name:
+                    copy_theme(self.script_dir, out, self.theme_name)
+                continue
+            try:
+                path.relative_to(self.vault)
+            except ValueError:
+                continue
+            
+            if is_note(self.vault, path):
+                old = self.notes.get(path)
+                if path.is_file():
+                    self.raw_notes[path] = read_note(self.vault, path)
+                    changed_keys |= index_note(self.index, self.raw_notes[path])
+                    to_resolve.add(path)
+                elif old is not None:
+                    changed_keys |= self.index.remove(path)
+                    self._forget(path)
+                    slugs.add(old[1])
+                    embedded.add(path)
+                    nav_changed = True
+            elif is_asset(path):
+                with timings.stage("assets"):
+                    if path.is_file():
+                        copy_asset(self.vault, out, path)
+                        changed_keys |= self.index.add_asset(path)
+                    else:
+                        out.remove(path.relative_to(self.vault).as_posix())
+                        changed_keys |= self.index.remove(path)
+        
+        # Then the changed notes and every note linking to a name whose target moved
+        with timings.stage("links"):
+            for key in changed_keys:
+                to_resolve |= self.linked_by.get(key, set())
+            for file in to_resolve:
+                if file not in self.raw_notes:
+                    continue
+                old = self.notes.get(file)
+                note = self._resolve(file)
+                if old is None or old[:4] != note[:4]:
+                    nav_changed = True
+                    slugs.add(note[1])
+                if old is not None and old[1] != note[1]:
+                    slugs.add(old[1])
+                if old is None or old[5] != note[5]:
+                    to_render.add(file)
+                if old != note:
+                    embedded.add(file)
+            
+            # A page belongs to the last note in path order with its slug, as in a full build
+            for slug in slugs:
+                owner = self.index.page_owner(page_output_path(slug)[0])
+                if owner is None:
+                    self._remove_page(out, slug)
+                else:
+                    to_wrap.add(owner)
+                if self.graph:
+                    # Which note's links count may have changed along with the owner
+                    for file in self.index.page_files.get(page_output_path(slug)[0], ()):
+                        self.backlinks_changed |= self.graph.outgoing.get(file, set())
+            
+            # Pages embedding a changed note keep their article; only the embed is rendered again
+            for file in embedded:
+                self.transcluder.forget(file)
+                to_wrap |= self.embedded_by.get(file, set())
+            
+            if self.graph:
+                to_wrap |= {self.index.page_owner(url + "index.html") for url in self.backlinks_changed} - {None}
+                if to_resolve or slugs:
+                    out.write_bytes(GRAPH_NAME, self.graph.to_json().encode("utf-8"))
+        
+        if nav_changed:
+            with timings.stage("navigation"):
+                old_nav = self.nav_by_depth
+                self._refresh_navigation(out)
+                changed_depths = {depth for depth in self.nav_by_depth if self.nav_by_depth[depth] != old_nav.get(depth)}
+                to_wrap |= {file for file, note in self.notes.items() if page_depth(note[1]) in changed_depths}
+                write_index(self.pages, self.vault_index_file, out, self.nav)
+        
+        if to_render and self.lazy:
+            for file in to_render:
+                self.articles.pop(file, None)
+        elif to_render:
+            if self.md is None:
+                self.md = new_markdown()
+            notes = [self.notes[file] for file in to_render]
+            for note, html in timings.iterate("render", render_articles(notes, 1, self.cache, self.md, timings)):
+                self.articles[note[4]] = html
+        
+        with timings.stage("write"):
+            for file in to_render | to_wrap:
+                if file in self.notes:
+                    self._write_page(out, self.notes[file])
+        self._check_links()
+        return True
+    
+    def _start_profile(self):
+        if self.options["profile"] and self.profiler is None:
+            import cProfile
+            self.profiler = cProfile.Profile()
+        if self.profiler:
+            self.profiler.enable()
+    
+    def _report(self, full, out):
+        """Print the build's per-stage breakdown and write the requested reports"""
+        timings = self.timings.finish()
+        pages = sum(1 for rel in out.changed | self.invalidated if rel.endswith(".html"))
+        print(f"✅ {'Built' if full else 'Updated'} {pages} page(s) in {timings.summary()}")
+        if self.options["timings"]:
+            print(timings.report())
+        if self.options["timings_json"]:
+            timings.write_json(self.options["timings_json"])
+    
+    def _stop_profile(self):
+        if self.profiler:
+            # Profiles accumulate over the session; the dump always holds every build so far
+            self.profiler.disable()
+            self.profiler.dump_stats(self.options["profile"])
+    
+    def _expand(self, changed_paths):
+        """Resolve changed paths to files, expanding created and deleted directories"""
+        paths = {Path(path) for path in changed_paths}
+        vault_paths = {path for path in paths if self.vault in path.parents}
+        # The snapshot knows what a deleted directory contained, so nothing is walked
+        return (paths - vault_paths) | self.snapshot.update(vault_paths)
+    
+    def _resolve(self, file):
+        links = []
+        note = resolve_note(self.raw_notes[file], self.index, links)
+        self.notes[file] = note
+        self._set_links(file, set(links))
+        if self.graph:
+            self.backlinks_changed |= graph_note(self.graph, note, links)
+        return note
+    
+    def _forget(self, file):
+        self.raw_notes.pop(file, None)
+        self.notes.pop(file, None)
+        self.articles.pop(file, None)
+        self._set_links(file, set())
+        self._set_embeds(file, set())
+        if self.graph:
+            self.backlinks_changed |= self.graph.remove(file)
+    
+    def _set_links(self, file, links):
+        old_keys = {link_key(target) for target in self.links.get(file, set())}
+        keys = {link_key(target) for target in links}
+        for key in old_keys - keys:
+            self.linked_by[key].discard(file)
+            if not self.linked_by[key]:
+                del self.linked_by[key]
+        for key in keys:
+            self.linked_by.setdefault(key, set()).add(file)
+        if links:
+            self.links[file] = links
+        else:
+            self.links.pop(file, None)
+    
+    def _check_links(self):
+        """With --check-links, print broken wikilinks and slug collisions after each build"""
+        if self.options.get("check_links"):
+            for line in link_report(self.vault, broken_links(self.links, self.index), self.index.collisions()):
+                print(f"⚠️  {line[2:]}")
+    
+    def _refresh_navigation(self, out):
+        self.pages, self.vault_index_file = index_pages(self.notes.values())
+        self.nav_by_depth = navigation_by_depth(self.pages, self.vault_index_file, self.nav)
+        if self.nav == "shared":
+            write_navigation_script(out, self.pages, self.vault_index_file)
+    
+    def _write_page(self, out, note):
+        """Write a note's page if its bytes changed; return True if written"""
+        if self.index.page_owner(page_output_path(note[1])[0]) != note[4]:
+            return False  # Another note with the same slug owns the page
+        if self.lazy:
+            return self._invalidate(page_output_path(note[1])[0])
+        return write_page(out, note, self._article(note), self.nav_by_depth, self._backlinks(note))
+    
+    def _article(self, note):
+        """Return a note's article with its embeds filled in, recording which notes it embeds"""
+        html, embeds = self.transcluder.expand(self.articles[note[4]], page_depth(note[1]), note[4])
+        self._set_embeds(note[4], embeds)
+        return html
+    
+    def _set_embeds(self, file, embeds):
+        for embedded in self.embeds.get(file, set()) - embeds:
+            self.embedded_by[embedded].discard(file)
+            if not self.embedded_by[embedded]:
+                del self.embedded_by[embedded]
+        for embedded in embeds:
+            self.embedded_by.setdefault(embedded, set()).add(file)
+        if embeds:
+            self.embeds[file] = embeds
+        else:
+            self.embeds.pop(file, None)
+    
+    def _backlinks(self, note):
+        return self.graph.backlinks(page_url(note[1])) if self.graph else ()
+    
+    def _remove_page(self, out, slug):
+        if self.lazy:
+            self._invalidate(page_output_path(slug)[0])
+        out.remove("index.html" if page_depth(slug) == 0 else slug.replace('.html', ''))
+    
+    # ── lazy mode ──────────────────────────────────────────────────────────────
+    def _invalidate(self, rel):
+        self.lazy_pages.pop(rel, None)
+        self.invalidated.add(rel)
+        return True
+    
+    def is_page(self, rel):
+        """Check if `rel` is the output path of a note's page"""
+        with self.lock:
+            return self.index.page_owner(rel) is not None
+    
+    def lazy_page(self, rel):
+        """Return (etag, html bytes) for the page at output path `rel`, rendering it on first request"""
+        with self.lock:
+            page = self.lazy_pages.get(rel)
+            if page is not None:
+                self.lazy_pages.move_to_end(rel)
+                return page
+            if not self.is_page(rel):
+                return None
+            
+            note = self.notes[self.index.page_owner(rel)]
+            self._render_article(note)
+            _, css_path, depth = page_output_path(note[1])
+            html = render_page(note[0], self._article(note) + backlinks_html(self._backlinks(note), depth),
+                               self.nav_by_depth[depth], css_path)
+            html = (minify_html(html) if self.options["minify"] else html).encode("utf-8")
+            page = (f'"{hashlib.sha1(html).hexdigest()[:16]}"', html)
+            self.lazy_pages[rel] = page
+            if len(self.lazy_pages) > self.lazy_cache_size:
+                self.lazy_pages.popitem(last=False)
+            return page
+    
+    def _render_article(self, note):
+        if note[4] not in self.articles:
+            if self.md is None:
+                self.md = new_markdown()
+            for note, html in render_articles([note], 1, self.cache, self.md):
+                self.articles[note[4]] = html
+    
+    def warm_up(self):
+        """Render every page's article in the background, yielding to requests between notes"""
+        def warm():
+            for file in list(self.notes):
+                with self.lock:
+                    note = self.notes.get(file)
+                    if note is not None:
+                        self._render_article(note)
+            print(f"🔥 Warmed up {len(self.articles)} page(s)")
+        threading.Thread(target=warm, name="warm-up", daemon=True).start()
+
+
+def build_site(vault_path, output_path, theme_name, jobs=1, cache=None, nav="inline", options=None):
+    """Build the static site, rendering pages in `jobs` worker processes"""
+    return IncrementalBuilder(vault_path, output_path, theme_name, jobs, cache, nav, options).build()
 
 
-def start_file_watcher(vault_path, output_path, theme_name, build_callback):
+def start_file_watcher(vault_path, output_path, theme_name, scheduler):
     """Start watching for file changes"""
+    from watchdog.observers import Observer
     vault_path = Path(vault_path).resolve()
     
-    event_handler = BuildHandler(vault_path, output_path, theme_name, build_callback)
+    event_handler = BuildHandler(vault_path, output_path, theme_name, scheduler)
     observer = Observer()
     
     # Watch the vault directory
@@ -200,24 +860,27 @@ def start_file_watcher(vault_path, output_path, theme_name, build_callback):
     return observer
 
 
-def start_web_server(output_path, host='localhost', port=8000):
+def start_web_server(output_path, host='localhost', port=8000, response_cache=None, live_reload=None, lazy_site=None):
     """Start the web server"""
     output_path = Path(output_path).resolve()
     
-    class CustomTCPServer(socketserver.TCPServer):
+    class DevServer(http.server.ThreadingHTTPServer):
         allow_reuse_address = True
+        daemon_threads = True
     
     # Create a partial function with the directory parameter
-    handler = functools.partial(QuietHTTPRequestHandler, directory=output_path)
+    handler = functools.partial(QuietHTTPRequestHandler, directory=str(output_path),
+                                response_cache=response_cache, live_reload=live_reload, lazy_site=lazy_site)
     
     try:
-        with CustomTCPServer((host, port), handler) as httpd:
+        with DevServer((host, port), handler) as httpd:
             server_url = f"http://{host}:{port}"
             print(f"🌐 Server running at {server_url}")
             print(f"📁 Serving: {output_path}")
             
             # Open browser automatically
             def open_browser():
+                import webbrowser
                 time.sleep(1)  # Give server time to start
                 webbrowser.open(server_url)
             
@@ -242,12 +905,15 @@ def parse_arguments():
     args = sys.argv[1:]
     
     if len(args) < 1:
-        return None, None, None, None, None
+        return None, None, None, None, None, None
     
     vault_path = args[0]
     theme_name = "paper-theme"
     host = "localhost"
     port = 8000
+    options = default_build_options()
+    options["lazy"] = False
+    options["warm"] = False
     
     i = 1
     while i < len(args):
@@ -259,24 +925,38 @@ def parse_arguments():
                 i += 2
             except ValueError:
                 print(f"❌ Invalid port number: {args[i + 1]}")
-                return None, None, None, None, None
+                return None, None, None, None, None, None
         elif arg == "--host" and i + 1 < len(args):
             host = args[i + 1]
             i += 2
-        elif not arg.startswith("--"):
+        elif arg == "--lazy":
+            options["lazy"] = True
+            i += 1
+        elif arg == "--warm":
+            options["lazy"] = options["warm"] = True
+            i += 1
+        elif arg.startswith("--"):
+            # Everything else is a build option shared with build_site.py
+            try:
+                next_i = parse_build_option(args, i, options)
+            except ValueError:
+                print(f"❌ Invalid value for {arg}: {args[i + 1]}")
+                return None, None, None, None, None, None
+            if next_i is None:
+                print(f"❌ Unknown argument: {arg}")
+                return None, None, None, None, None, None
+            i = next_i
+        else:
             # This should be the theme name
             theme_name = arg
             i += 1
-        else:
-            print(f"❌ Unknown argument: {arg}")
-            return None, None, None, None, None
     
     # Create output path
     vault_name = Path(vault_path).name.replace(' ', '_')
     script_dir = Path(__file__).parent
     output_path = script_dir / "Outputs" / f"{vault_name}_dev"
     
-    return vault_path, str(output_path), theme_name, host, port
+    return vault_path, str(output_path), theme_name, host, port, options
 
 
 def main():
@@ -293,6 +973,11 @@ def main():
         print("Options:")
         print("  --port PORT   Port to serve on (default: 8000)")
         print("  --host HOST   Host to bind to (default: localhost)")
+        print("  --lazy        Start serving right after scanning notes; render pages on first request")
+        print("  --warm        Like --lazy, and render the remaining pages in the background")
+        print()
+        print("Build options:")
+        print(BUILD_OPTIONS_HELP)
         print()
         print("Available themes:")
         script_dir = Path(__file__).parent
@@ -310,9 +995,9 @@ def main():
         print("  python serve.py ~/MyVault --host 0.0.0.0 --port 8080")
         return
     
-    vault_path, output_path, theme_name, host, port = parse_arguments()
+    vault_path, output_path, theme_name, host, port, options = parse_arguments()
     
-    if not all([vault_path, output_path, theme_name, host, port]):
+    if not all([vault_path, output_path, theme_name, host, port, options]):
         return
     
     # Convert to absolute paths BEFORE changing directories
@@ -337,45 +1022,57 @@ def main():
     print("🚀 Obsidian Static Site Generator - Development Server")
     print("=" * 60)
     
-    # Initial build
-    if not build_site(vault_path, output_path, theme_name):
+    # Keep one render cache and highlight cache for the initial build and every rebuild
+    cache = open_render_cache(options, script_dir)
+    highlight_cache = open_highlight_cache(options, script_dir)
+    use_highlight_cache(highlight_cache)
+    jobs = options["jobs"]
+    
+    # Initial build; the builder keeps the dependency graph for incremental rebuilds
+    builder = IncrementalBuilder(vault_path, output_path, theme_name, jobs, cache, options["nav"], options)
+    if not builder.build():
         print("❌ Initial build failed. Exiting.")
         return
+    if options["warm"]:
+        builder.warm_up()
     
-    # Set up rebuild callback with correct arguments
-    # Store the original paths to avoid variable scope issues
-    original_vault_path = vault_path
-    original_output_path = output_path
-    original_theme_name = theme_name
-    
-    def rebuild_callback():
-        print("🔄 Rebuilding...")
-        print(f"   📂 Vault: {original_vault_path}")
-        print(f"   📁 Output: {original_output_path}")
-        print(f"   🎨 Theme: {original_theme_name}")
-        if build_site(original_vault_path, original_output_path, original_theme_name):
-            print("✅ Rebuild complete")
-        else:
+    # Compressed responses are dropped as soon as a build publishes new files
+    response_cache = CompressedResponseCache()
+    builder.publish_listeners.append(response_cache.invalidate)
+    
+    # Open tabs reload (or swap their stylesheet) as soon as a build is published
+    live_reload = LiveReload()
+    builder.publish_listeners.append(live_reload.notify)
+    
+    def rebuild_callback(changed_paths):
+        print(f"🔄 Rebuilding ({len(changed_paths)} changed)...")
+        if not builder.build(changed_paths):
             print("❌ Rebuild failed")
     
-    # Start file watcher
-    observer = start_file_watcher(vault_path, output_path, theme_name, rebuild_callback)
+    # Start the build worker and file watcher
+    # A short debounce keeps edit-to-screen latency low; bursts still coalesce
+    scheduler = BuildScheduler(rebuild_callback, debounce=0.05)
+    scheduler.start()
+    observer = start_file_watcher(vault_path, output_path, theme_name, scheduler)
     
     print("\n" + "=" * 60)
     print("💡 Development server ready!")
     print(f"   📝 Edit files in: {Path(vault_path).resolve()}")
     print(f"   🎨 Change themes in: {script_dir}/Themes/")
-    print(f"   🔄 Auto-rebuild on file save")
+    print(f"   🔄 Auto-rebuild and browser reload on file save")
     print(f"   ⌨️  Press Ctrl+C to stop")
     print("=" * 60)
     
     try:
         # Start web server (this blocks)
-        start_web_server(output_path, host, port)
+        start_web_server(output_path, host, port, response_cache, live_reload, builder if builder.lazy else None)
     finally:
-        # Clean up file watcher
+        # Clean up file watcher and build worker
         observer.stop()
         observer.join()
+        scheduler.stop()
+        highlight_cache.evict()
+        builder.snapshot.save()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,95 @@
+"""
+Sharded builds.
+
+``build_site.py --shard i/N`` scans every note, so navigation, slugs and link
+targets are the same in every shard, but only renders the pages assigned to
+shard i. Pages are assigned by a hash of their output path. Every shard also
+writes the shared files (theme, assets, nav.js, placeholder index), and shard
+1 is the one that owns them.
+
+``merge_shards`` assembles the shard outputs into one site and checks that
+every page was rendered exactly once.
+"""
+
+import json
+import hashlib
+from pathlib import Path
+
+SHARD_MANIFEST_NAME = "shard-manifest.json"
+COMPRESSED_SUFFIXES = (".gz", ".br")
+# Per-shard files that describe the shard rather than the site
+SHARD_LOCAL_FILES = {SHARD_MANIFEST_NAME, "deploy-manifest.json"}
+
+
+def parse_shard(value:str):
+    """Parse "i/N" (1 ≤ i ≤ N) into (i, N); raise ValueError otherwise"""
+    index, count = map(int, value.split("/"))
+    if not 1 <= index <= count:
+        raise ValueError(value)
+    return index, count
+
+
+def shard_of(rel:str, count:int) -> int:
+    """Return the shard (1..count) that renders the page at output path `rel`"""
+    return int(hashlib.sha256(rel.encode("utf-8")).hexdigest()[:8], 16) % count + 1
+
+
+def write_shard_manifest(out, shard, page_paths):
+    """Record which shard this output is and every page path of the whole site"""
+    index, count = shard
+    manifest = {"shard": index, "shards": count, "pages": sorted(page_paths)}
+    out.write_bytes(SHARD_MANIFEST_NAME, (json.dumps(manifest, indent=1) + "\n").encode("utf-8"))
+
+
+def _uncompressed(rel:str) -> str:
+    return rel[:-3] if rel.endswith(COMPRESSED_SUFFIXES) else rel
+
+
+def _owner(rel:str, pages:set, count:int) -> int:
+    page = _uncompressed(rel)
+    return shard_of(page, count) if page in pages else 1
+
+
+def merge_shards(out, shard_dirs):
+    """Copy the shard outputs in `shard_dirs` into the OutputWriter `out`.
+
+    Raises ValueError if shards are missing, duplicated or were built from
+    different vaults, or if a page is missing or rendered by the wrong shard.
+    """
+    manifests = {}
+    for shard_dir in map(Path, shard_dirs):
+        try:
+            manifest = json.loads((shard_dir / SHARD_MANIFEST_NAME).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            raise ValueError(f"{shard_dir} is not a shard output (no {SHARD_MANIFEST_NAME})")
+        if manifest["shard"] in manifests:
+            raise ValueError(f"shard {manifest['shard']} given twice")
+        manifests[manifest["shard"]] = (shard_dir, manifest)
+
+    count = next(iter(manifests.values()))[1]["shards"]
+    pages = next(iter(manifests.values()))[1]["pages"]
+    missing_shards = sorted(set(range(1, count + 1)) - set(manifests))
+    if missing_shards:
+        raise ValueError(f"missing shard(s): {', '.join(map(str, missing_shards))} of {count}")
+    for shard_dir, manifest in manifests.values():
+        if manifest["shards"] != count or manifest["pages"] != pages:
+            raise ValueError(f"{shard_dir} was built with a different shard count or vault")
+
+    page_set = set(pages)
+    for index, (shard_dir, manifest) in sorted(manifests.items()):
+        for path in sorted(shard_dir.rglob("*")):
+            if path.is_dir():
+                continue
+            rel = path.relative_to(shard_dir).as_posix()
+            if _uncompressed(rel) in SHARD_LOCAL_FILES:
+                continue
+            owner = _owner(rel, page_set, count)
+            if owner == index:
+                out.copy_file(path, rel)
+            elif rel in page_set:
+                raise ValueError(f"{rel} was rendered by shard {index} but belongs to shard {owner}")
+
+    missing = sorted(page_set - out.produced)
+    if missing:
+        raise ValueError(f"{len(missing)} page(s) missing, e.g. {missing[0]}")
+    return count
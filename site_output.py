@@ -0,0 +1,280 @@
+"""
+Staged, atomically published output directories.
+
+Builds never write into the directory that is being served. They write into a
+sibling staging directory (``.<name>.staging``) through an ``OutputWriter``,
+and ``publish()`` swaps the stage with the live output in a single step. On
+Linux the swap is an atomic ``renameat2(RENAME_EXCHANGE)``. Elsewhere it falls
+back to two renames. The previous generation stays complete until the swap,
+and a failed build leaves it untouched.
+
+After a swap the previous generation is kept as the next stage. The paths the
+build changed are recorded in ``.<name>.pending``, and ``begin_stage()``
+hardlinks just those paths from the live output to bring the stage up to date.
+A build therefore only touches the files whose content changed. Unchanged
+files keep their inode and mtime across generations, which keeps
+rsync-style deploys cheap.
+"""
+
+import os
+import sys
+import json
+import shutil
+import ctypes
+from pathlib import Path
+from postprocess import minify
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2
+FICLONE = 0x40049409  # Linux ioctl for copy-on-write reflinks
+
+_reflink_supported = sys.platform.startswith("linux") and fcntl is not None
+
+
+def stage_path(out:Path) -> Path:
+    """Return the staging directory used for builds of `out`"""
+    return out.with_name(f".{out.name}.staging")
+
+
+def _pending_path(out:Path) -> Path:
+    return out.with_name(f".{out.name}.pending")
+
+
+def begin_stage(out:Path) -> Path:
+    """Prepare the staging directory for `out` so it mirrors the live output.
+
+    Files in the stage may share inodes with the live output. Write them only
+    through an OutputWriter, which replaces files instead of modifying them.
+    """
+    stage = stage_path(out)
+    pending = _pending_path(out)
+    try:
+        changed = json.loads(pending.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        changed = None
+    pending.unlink(missing_ok=True)
+
+    if changed is not None and stage.is_dir() and out.is_dir():
+        # Catch up with what the last published build changed
+        for rel in changed:
+            _sync_path(out / rel, stage / rel, stage)
+    else:
+        if stage.exists():
+            shutil.rmtree(stage)
+        if out.is_dir():
+            shutil.copytree(out, stage, symlinks=True, copy_function=_link_or_copy)
+        else:
+            stage.mkdir(parents=True)
+    return stage
+
+
+def discard_stage(out:Path):
+    """Throw away a failed build's staging directory"""
+    shutil.rmtree(stage_path(out), ignore_errors=True)
+    _pending_path(out).unlink(missing_ok=True)
+
+
+def publish(stage:Path, out:Path, changed=None):
+    """Make `stage` the live output.
+
+    `changed` lists the relative paths written or removed by the build. When it
+    is given, the previous generation is kept as the next stage. Otherwise the
+    previous generation is deleted.
+    """
+    if not out.exists():
+        os.rename(stage, out)
+        return
+
+    if not _exchange(stage, out):
+        # Two renames: a request may briefly miss the output directory
+        old = out.with_name(f".{out.name}.old")
+        if old.exists():
+            shutil.rmtree(old)
+        os.rename(out, old)
+        os.rename(stage, out)
+        os.rename(old, stage)
+
+    # The previous generation now sits at the stage path
+    if changed is None:
+        shutil.rmtree(stage)
+    else:
+        _pending_path(out).write_text(json.dumps(sorted(changed)), encoding="utf-8")
+
+
+class OutputWriter:
+    """Writes build output under `root`, leaving files with unchanged content untouched.
+
+    Every written path is recorded in `produced`, and the paths whose content
+    actually changed are recorded in `changed`. Files are always replaced
+    through a temporary file and a rename, never rewritten in place. With
+    `minify`, HTML and CSS text is minified before it is compared and written.
+    With a `fingerprint`, assets are written under content-hashed names and
+    references in HTML and CSS written later are rewritten to match.
+    """
+
+    def __init__(self, root, minify=False, fingerprint=None):
+        self.root = Path(root)
+        self.minify = minify
+        self.fingerprint = fingerprint  # Fingerprinter renaming assets, or None
+        self.produced = set()
+        self.changed = set()
+
+    @staticmethod
+    def wrap(out):
+        """Accept either an OutputWriter or a plain output directory"""
+        return out if isinstance(out, OutputWriter) else OutputWriter(out)
+
+    def path(self, rel:str) -> Path:
+        return self.root / rel
+
+    def write_text(self, rel:str, text:str) -> bool:
+        if self.fingerprint:
+            text = self.fingerprint.rewrite(rel, text) if rel.endswith((".html", ".css")) else text
+        if self.minify:
+            text = minify(rel, text)
+        data = text.encode("utf-8")
+        if self.fingerprint and self.fingerprint.applies_to(rel):
+            rel = self.fingerprint.add_bytes(rel, data)
+        return self.write_bytes(rel, data)
+
+    def write_bytes(self, rel:str, data:bytes) -> bool:
+        """Write `data` to `rel` unless the file already holds it; return True if written"""
+        self.produced.add(rel)
+        path = self.root / rel
+        try:
+            if path.stat().st_size == len(data) and path.read_bytes() == data:
+                return False
+        except OSError:
+            path.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        self.changed.add(rel)
+        return True
+
+    def copy_file(self, src:Path, rel:str, stat=None) -> bool:
+        """Copy `src` to `rel` unless size and mtime already match; return True if copied.
+
+        `stat` is the (size, mtime_ns) of `src` if the caller already knows it.
+        Uses a copy-on-write reflink when the filesystem allows it, and falls
+        back to a regular copy. Never hardlinks: an in-place edit of the vault
+        file would change the live site without a build.
+        """
+        if self.fingerprint and self.fingerprint.applies_to(rel):
+            rel = self.fingerprint.add_file(rel, src)
+        self.produced.add(rel)
+        path = self.root / rel
+        if stat is None:
+            src_stat = src.stat()
+            stat = (src_stat.st_size, src_stat.st_mtime_ns)
+        try:
+            dest_stat = path.stat()
+            # A file still sharing its inode with the source (hardlinked by an
+            # older build) is copied again, as it can't be trusted to be current
+            if (dest_stat.st_size, dest_stat.st_mtime_ns) == stat and not (
+                    dest_stat.st_nlink > 1 and os.path.samestat(dest_stat, src.stat())):
+                return False
+        except OSError:
+            path.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.unlink(missing_ok=True)
+        if not _reflink(src, tmp):
+            shutil.copy2(src, tmp)
+        os.replace(tmp, path)
+        self.changed.add(rel)
+        return True
+
+    def remove(self, rel:str):
+        """Remove an output file (or page directory) produced by an earlier build"""
+        path = self.root / rel
+        if path.is_dir():
+            for child in path.rglob("*"):
+                if not child.is_dir():
+                    self.changed.add(child.relative_to(self.root).as_posix())
+            shutil.rmtree(path)
+        elif path.exists():
+            path.unlink()
+            self.changed.add(rel)
+        _remove_empty_parents(path, self.root)
+
+    def prune(self):
+        """Remove every file that this writer did not produce (after a full build)"""
+        for path in sorted(self.root.rglob("*"), reverse=True):
+            if path.is_dir():
+                if not any(path.iterdir()):
+                    path.rmdir()
+                continue
+            rel = path.relative_to(self.root).as_posix()
+            if rel not in self.produced:
+                path.unlink()
+                self.changed.add(rel)
+
+
+def _sync_path(src:Path, dest:Path, root:Path):
+    """Make dest mirror src (a file, or nothing) by hardlinking or removing"""
+    if src.is_file():
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(f".{dest.name}.tmp")
+        tmp.unlink(missing_ok=True)
+        _link_or_copy(src, tmp)
+        os.replace(tmp, dest)
+    elif dest.is_dir():
+        shutil.rmtree(dest)
+    else:
+        dest.unlink(missing_ok=True)
+        _remove_empty_parents(dest, root)
+
+
+def _remove_empty_parents(path:Path, root:Path):
+    parent = path.parent
+    while parent != root and root in parent.parents:
+        try:
+            parent.rmdir()
+        except OSError:
+            break
+        parent = parent.parent
+
+
+def _link_or_copy(src, dst):
+    # Only for files between output generations, which are never modified in place
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _reflink(src:Path, dst:Path) -> bool:
+    """Clone src to dst with a copy-on-write reflink; return False if unsupported"""
+    global _reflink_supported
+    if not _reflink_supported:
+        return False
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+    except OSError:
+        # Filesystem (or pair of filesystems) can't reflink; don't try again
+        _reflink_supported = False
+        dst.unlink(missing_ok=True)
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+
+def _exchange(a:Path, b:Path) -> bool:
+    """Atomically swap two paths; return False if the platform can't"""
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        renameat2 = ctypes.CDLL(None, use_errno=True).renameat2
+    except (OSError, AttributeError):
+        return False
+    renameat2.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    renameat2.restype = ctypes.c_int
+    return renameat2(AT_FDCWD, os.fsencode(a), AT_FDCWD, os.fsencode(b), RENAME_EXCHANGE) == 0
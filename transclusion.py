@@ -0,0 +1,162 @@
+"""
+Embedded notes.
+
+``![[Note]]``, ``![[Note#Heading]]`` and ``![[Note#^block-id]]`` become
+placeholders in the preprocessed text, so an article's HTML (and its cache
+entry) never depends on the notes it embeds. A ``Transcluder`` fills them
+in after conversion, when the page is written.
+
+The ``Transcluder`` doesn't read or render notes itself: it is given a
+``source`` callable that returns a note's title, URL and raw text, and a
+``render`` callable that turns Markdown into HTML for a page at a given
+depth, so embeds are rendered exactly like articles.
+"""
+
+import re
+import urllib.parse
+from pathlib import Path
+from wikilinks import EMBED_RE, slugify
+
+MAX_EMBED_DEPTH = 4  # Nested embeds below this are shown as links
+HEADING_RE = re.compile(r"^(#{1,6})[ \t]+(.*?)[ \t#]*$")
+BLOCK_ID_RE = re.compile(r"(?:^|[ \t])\^([\w-]+)[ \t]*$")
+LIST_ITEM_RE = re.compile(r"^[ \t]*(?:[-*+]|\d+[.)])[ \t]")
+FENCE_LINE_RE = re.compile(r"^[ ]{0,3}(`{3,}|~{3,})")
+ANCHOR_RE = re.compile(r'(\sid="|\shref="#)')  # heading and footnote anchors in rendered HTML
+
+EMBED_CSS = """.embed { margin: 1em 0; padding-left: 1em; border-left: 3px solid var(--faint); }
+.embed-source { font-size: 0.9em; margin: 0; }
+"""
+
+
+def note_section(text:str, section:str):
+    """Return the Markdown of a note's `section`: "" for the whole note, a heading or "^block-id".
+
+    A heading's section runs to the next heading of the same or a higher
+    level. A block is the paragraph or list item ending in ^block-id, or the
+    paragraph right above a line holding only the id. Block ids are left out
+    of the result. Returns None if the note has no such section.
+    """
+    lines = text.splitlines()
+    fence = None
+    start = None if section else 0
+    stop = level = None
+    ids = {}  # line number → the line without its ^block-id
+    for i, line in enumerate(lines):
+        mark = FENCE_LINE_RE.match(line)
+        if mark:
+            mark = mark.group(1)
+            if fence is None:
+                fence = mark
+            elif mark[0] == fence[0] and len(mark) >= len(fence):
+                fence = None
+            continue
+        if fence is not None:
+            continue
+        block = BLOCK_ID_RE.search(line)
+        if block:
+            ids[i] = line[:block.start()]
+        if section.startswith("^"):
+            if block and block.group(1) == section[1:]:
+                return _block_at([ids.get(j, lines[j]) for j in range(i + 1)], i)
+            continue
+        heading = HEADING_RE.match(line) if section else None
+        if heading:
+            if start is not None and len(heading.group(1)) <= level:
+                stop = i
+                break
+            if start is None and slugify(heading.group(2)) == slugify(section):
+                start, level = i, len(heading.group(1))
+    if start is None:
+        return None
+    return "\n".join(ids.get(i, lines[i]) for i in range(start, stop or len(lines)))
+
+
+def _block_at(lines, i):
+    """Return the block whose ^id was on line i, given the lines up to i with the ids taken out"""
+    if LIST_ITEM_RE.match(lines[i]):
+        return lines[i].strip()
+    first = i
+    while first > 0 and lines[first - 1].strip() and not HEADING_RE.match(lines[first - 1]):
+        first -= 1
+    # The id either ends the block's last line or sits alone below the block
+    return "\n".join(lines[first:i] + ([lines[i]] if lines[i].strip() else []))
+
+
+class Transcluder:
+    """Fills the embed placeholders in rendered articles with the embedded notes.
+
+    Every (note, section) is rendered once per page depth and kept, so a
+    snippet embedded in thousands of pages is converted once per build.
+    Anchors in a fragment get an "embed-<note>-" prefix so they don't clash
+    with the host page's.
+
+    Only an embed on a line of its own is filled in; one inside a paragraph,
+    list item or table cell becomes a link to the note, as a block there
+    would be invalid HTML. Nested embeds are filled in up to MAX_EMBED_DEPTH
+    levels deep. An embed that would include itself, or doesn't fit under
+    the limit, is shown as a link as well.
+    """
+
+    def __init__(self, vault:Path, source, render):
+        self.vault = vault
+        self.source = source  # note file → (title, URL relative to the site root, raw text); may raise OSError
+        self.render = render  # (Markdown, page depth) → HTML with placeholders left in
+        self.sources = {}     # note file → (title, URL, raw text), read when first embedded
+        self.fragments = {}   # note file → {(section, depth): HTML with placeholders left in, or None}
+
+    def forget(self, file:Path):
+        """Drop a note's text and fragments after it changed"""
+        self.sources.pop(file, None)
+        self.fragments.pop(file, None)
+
+    def expand(self, html:str, depth:int, host:Path=None):
+        """Return (html with embeds filled in, set of note files embedded directly or through other embeds)"""
+        used = set()
+        if "<!--embed:" not in html:
+            return html, used
+        return self._expand(html, depth, [(host, "")], used), used
+
+    def _expand(self, html, depth, stack, used):
+        def fill(m):
+            file = self.vault / urllib.parse.unquote(m.group(1))
+            section = urllib.parse.unquote(m.group(2))
+            used.add(file)
+            source = self._source(file)
+            if source is None:
+                return ""
+            title, url, text = source
+            url = ("../" * depth + url) or "./"
+            block = html.startswith("\n", m.end()) or m.end() == len(html)
+            block = block and (m.start() == 0 or html[m.start() - 1] == "\n")
+            fragment = None
+            if block and (file, section) not in stack and len(stack) <= MAX_EMBED_DEPTH:
+                fragment = self._fragment(file, section, text, title, depth)
+            if fragment is None:
+                # Inline, a missing section, a cycle or too deep: link to the note instead
+                anchor = "#" + slugify(section) if section and not section.startswith("^") else ""
+                label = f"{title} › {section}" if section else title
+                link = f"<a class='embed-link' href='{url}{anchor}'>{label}</a>"
+                return f"<p>{link}</p>" if block else link
+            inner = self._expand(fragment, depth, stack + [(file, section)], used)
+            return f"<div class='embed'>\n<p class='embed-source'><a href='{url}'>{title}</a></p>\n{inner}\n</div>"
+        return EMBED_RE.sub(fill, html)
+
+    def _source(self, file):
+        if file not in self.sources:
+            try:
+                self.sources[file] = self.source(file)
+            except OSError:
+                self.sources[file] = None
+        return self.sources[file]
+
+    def _fragment(self, file, section, text, title, depth):
+        fragments = self.fragments.setdefault(file, {})
+        if (section, depth) not in fragments:
+            markdown = note_section(text, section)
+            if markdown is None:
+                fragments[(section, depth)] = None
+            else:
+                prefix = f"embed-{slugify(title)}-"
+                fragments[(section, depth)] = ANCHOR_RE.sub(lambda m: m.group(1) + prefix, self.render(markdown, depth))
+        return fragments[(section, depth)]
@@ -0,0 +1,207 @@
+"""
+Vault snapshot: one ``os.scandir`` walk over the vault, kept between runs.
+
+A ``VaultSnapshot`` records every file in the vault with its kind, size and
+mtime, plus each directory's mtime and listing. Kinds:
+
+    note      a Markdown note that becomes a page
+    resource  a Markdown note under a ``Resources`` directory (not rendered)
+    asset     any other file, copied to the output as-is
+    other     canvases and other files that are neither rendered nor copied
+
+``scan()`` brings the snapshot up to date. Files are always stat'd, because
+editing a file doesn't change its directory's mtime. A directory whose mtime
+matches the recorded one is not listed again, though, unless the mtime was
+too close to when the listing was taken to rule out a change in the same
+clock tick. ``update()`` applies watcher events without walking anything.
+
+Saved snapshots live in the cache directory. They only speed up the next
+scan; a missing or stale file is never trusted for more than that.
+"""
+
+import os
+import json
+import stat
+import time
+import hashlib
+import posixpath
+from pathlib import Path
+
+SNAPSHOT_VERSION = 1
+NOTE, RESOURCE, ASSET, OTHER = "note", "resource", "asset", "other"
+# Listings taken less than this long after the directory's mtime are re-read
+RACY_NS = 2 * 10**9
+
+
+def classify(rel:str) -> str:
+    """Return the kind of the vault file at relative posix path `rel`"""
+    suffix = posixpath.splitext(rel)[1]
+    if suffix == ".md":
+        return RESOURCE if "Resources" in rel.split("/") else NOTE
+    if suffix.lower() in {".md", ".canvas"}:
+        return OTHER
+    return ASSET
+
+
+def _sort_key(rel:str):
+    # Same order as sorting the Paths, so notes resolve slug collisions as before
+    return rel.split("/")
+
+
+class VaultSnapshot:
+    """The files of a vault: `files` maps relative paths to (kind, size, mtime_ns)"""
+
+    def __init__(self, vault, path=None):
+        self.vault = Path(vault)
+        self.path = Path(path) if path else None  # where the snapshot is saved, if anywhere
+        self.files = {}
+        self.dirs = {}  # relative dir ("" for the vault) → (mtime_ns, child names, listed_at_ns)
+        self.dirty = False
+        self.load()
+
+    # ── persistence ───────────────────────────────────────────────────────────
+    def load(self):
+        if self.path is None:
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data["version"] != SNAPSHOT_VERSION or data["vault"] != str(self.vault):
+                return
+            self.files = {rel: tuple(entry) for rel, entry in data["files"].items()}
+            self.dirs = {rel: tuple(entry) for rel, entry in data["dirs"].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            self.files, self.dirs = {}, {}
+
+    def save(self):
+        """Write the snapshot if it changed since it was loaded; failures only cost a slower scan"""
+        if self.path is None or not self.dirty:
+            return
+        data = {"version": SNAPSHOT_VERSION, "vault": str(self.vault), "files": self.files, "dirs": self.dirs}
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+            os.replace(tmp, self.path)
+            self.dirty = False
+        except OSError:
+            tmp.unlink(missing_ok=True)
+
+    # ── scanning ──────────────────────────────────────────────────────────────
+    def scan(self):
+        """Walk the vault and return the set of relative paths added, changed or removed"""
+        old_files, old_dirs = self.files, self.dirs
+        self.files, self.dirs = {}, {}
+        self._walk("", old_dirs)
+        changed = {rel for rel in old_files.keys() | self.files.keys() if old_files.get(rel) != self.files.get(rel)}
+        if changed or old_dirs != self.dirs:
+            self.dirty = True
+        return changed
+
+    def _walk(self, top:str, old_dirs:dict):
+        stack = [top]
+        while stack:
+            rel = stack.pop()
+            path = os.path.join(self.vault, rel)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            old = old_dirs.get(rel)
+            if old and old[0] == mtime and mtime < old[2] - RACY_NS:
+                # Listing unchanged: only the files need a stat
+                for name in old[1]:
+                    child = posixpath.join(rel, name)
+                    if child in old_dirs:
+                        stack.append(child)
+                    else:
+                        self._stat(child, old_dirs)
+                self.dirs[rel] = old
+                continue
+
+            listed_at = time.time_ns()
+            names = []
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        child = posixpath.join(rel, entry.name)
+                        try:
+                            if entry.is_dir():
+                                # Symlinked directories are not followed, as with Path.rglob
+                                if not entry.is_symlink():
+                                    names.append(entry.name)
+                                    stack.append(child)
+                                continue
+                            self._add(child, entry.stat())
+                            names.append(entry.name)
+                        except OSError:
+                            continue  # e.g. a broken symlink
+            except OSError:
+                continue
+            self.dirs[rel] = (mtime, sorted(names), listed_at)
+
+    def _stat(self, rel:str, old_dirs:dict):
+        try:
+            st = os.stat(os.path.join(self.vault, rel))
+        except OSError:
+            return
+        if stat.S_ISDIR(st.st_mode):
+            self._walk(rel, old_dirs)
+        else:
+            self._add(rel, st)
+
+    def _add(self, rel:str, st):
+        self.files[rel] = (classify(rel), st.st_size, st.st_mtime_ns)
+
+    # ── watcher events ────────────────────────────────────────────────────────
+    def update(self, paths):
+        """Apply changed, created or deleted paths reported by a file watcher.
+
+        Returns the vault files affected: every reported file, the files in
+        created directories and the files that were in deleted ones.
+        """
+        affected = set()
+        for path in map(Path, paths):
+            try:
+                rel = path.relative_to(self.vault).as_posix()
+            except ValueError:
+                continue
+            if rel == ".":
+                continue
+            existed = rel in self.files or rel in self.dirs
+            self.dirty = True
+
+            prefix = rel + "/"
+            under = [child for child in self.files if child.startswith(prefix)]
+            for child in under:
+                del self.files[child]
+            for child in [child for child in self.dirs if child == rel or child.startswith(prefix)]:
+                del self.dirs[child]
+            affected.update(under)
+            self.files.pop(rel, None)
+
+            if path.is_dir():
+                before = set(self.files)
+                self._walk(rel, {})
+                affected.update(set(self.files) - before)
+            else:
+                self._stat(rel, {})
+                affected.add(rel)
+            if existed != (rel in self.files or rel in self.dirs):
+                # The parent's listing changed; have the next scan read it again
+                self.dirs.pop(posixpath.dirname(rel), None)
+        return {self.vault / rel for rel in affected}
+
+    # ── queries ───────────────────────────────────────────────────────────────
+    def entries(self, kind:str):
+        """Yield (path, size, mtime_ns) for files of `kind`, in path order"""
+        for rel in sorted((rel for rel, entry in self.files.items() if entry[0] == kind), key=_sort_key):
+            _, size, mtime = self.files[rel]
+            yield self.vault / rel, size, mtime
+
+    def notes(self):
+        return [path for path, size, mtime in self.entries(NOTE)]
+
+
+def snapshot_path(cache_dir:Path, vault:Path) -> Path:
+    """Return where the snapshot of `vault` is kept in `cache_dir`"""
+    return Path(cache_dir) / "snapshots" / f"{hashlib.sha256(str(vault).encode('utf-8')).hexdigest()[:16]}.json"
@@ -0,0 +1,293 @@
+"""
+Wikilink resolution and the link graph.
+
+A ``LinkIndex`` maps every name a ``[[wikilink]]`` can use to the URL it
+points at, so resolving a link is one dict lookup. Notes are indexed under
+their aliases, title, slug, file name and vault path, in that order of
+precedence; assets under their file name and vault path. When several files
+share a name, the one that comes last in path order wins, which is also the
+rule for notes whose pages share an output path.
+
+Notes and assets can be added and removed one at a time. Every change
+returns the link keys whose target changed, so the dev server knows which
+notes to resolve again.
+
+A ``LinkGraph`` records which pages each note links to, and the inverse, for
+backlinks and ``graph.json``.
+"""
+
+import re
+import json
+import functools
+import unicodedata
+import urllib.parse
+from pathlib import Path
+
+GRAPH_NAME = "graph.json"
+LINK_MEMO_SIZE = 16384  # resolved [[...]] kept per LinkIndex
+
+# Precedence of the names a note or asset can be linked by
+LINK_BY_ALIAS, LINK_BY_TITLE, LINK_BY_SLUG, LINK_BY_NAME, LINK_BY_PATH = range(5)
+
+# ![[Note]] embeds become placeholders that pass through Markdown unchanged
+EMBED_RE = re.compile(r"<!--embed:([^#\s]*)#(\S*?)-->")
+
+BACKLINKS_CSS = """.backlinks { margin-top: 3em; padding-top: 1em; border-top: 1px solid var(--faint); }
+.backlinks h2 { font-size: 1em; }
+"""
+
+
+@functools.lru_cache(maxsize=8192)
+def slugify(text:str, allow_unicode=False)->str:
+    if allow_unicode:
+        text = unicodedata.normalize("NFKC", text)
+    else:
+        text = unicodedata.normalize("NFKD", text).encode("ascii","ignore").decode()
+    text = re.sub(r"[^\w\s-]", "", text.lower())
+    return re.sub(r"[-\s]+", "-", text).strip("-_")
+
+
+def link_key(target:str) -> str:
+    """Normalize a wikilink target: case and repeated whitespace don't matter, ".md" is optional"""
+    target = " ".join(target.split()).casefold()
+    return target[:-3] if target.endswith(".md") else target
+
+
+def embed_placeholder(rel:str, section:str) -> str:
+    """Return the placeholder for embedding `section` ("" for all) of the note at vault path `rel`"""
+    return f"<!--embed:{urllib.parse.quote(rel)}#{urllib.parse.quote(section, safe='^')}-->"
+
+
+class LinkIndex:
+    """Resolves wikilink targets to site URLs with one dict lookup per link.
+
+    URLs are relative to the site root. Notes also record the output path of
+    their page, which decides which note owns a page when slugs collide. An
+    output path reserved for a generated page (like the search page) is
+    owned by no note.
+    """
+
+    def __init__(self, vault:Path=None):
+        self.vault = vault
+        self.candidates = {}  # link key → {file: (-precedence, path order, url)}
+        self.urls = {}        # link key → url of the winning candidate
+        self.files = {}       # link key → the winning file
+        self.keys = {}        # file → link keys it was added under
+        self.page_files = {}  # page output path → note files whose slug maps there
+        self.note_pages = {}  # note file → its page output path
+        self.reserved = {}    # page output path → the generated page written there instead of a note
+        # LRU memo for markdown_link; cleared on every change
+        self._links = functools.lru_cache(maxsize=LINK_MEMO_SIZE)(self._markdown_link)
+
+    def add_note(self, file:Path, names, url:str, page:str):
+        """Add or replace a note published at `url` (output path `page`).
+
+        `names` are (precedence, name) pairs. Returns the link keys whose
+        target changed.
+        """
+        changed = self.remove(file)
+        self.note_pages[file] = page
+        self.page_files.setdefault(page, set()).add(file)
+        return changed | self._add(file, names, url)
+
+    def add_asset(self, file:Path):
+        rel = file.relative_to(self.vault).as_posix()
+        changed = self.remove(file)
+        return changed | self._add(file, [(LINK_BY_NAME, file.name), (LINK_BY_PATH, rel)], urllib.parse.quote(rel))
+
+    def _add(self, file, names, url):
+        self._links.cache_clear()
+        changed = set()
+        self.keys[file] = set()
+        for precedence, name in names:
+            key = link_key(name)
+            if not key:
+                continue
+            candidates = self.candidates.setdefault(key, {})
+            current = candidates.get(file)
+            if current is None or current[0] < -precedence:
+                # Negated, so the best candidate is simply the largest tuple
+                candidates[file] = candidate = (-precedence, file.parts, url)
+                self.keys[file].add(key)
+                # Only the current winner can beat a new candidate
+                winner = self.files.get(key)
+                if winner != file and (winner is None or candidate > candidates[winner]):
+                    self.urls[key], self.files[key] = url, file
+                    changed.add(key)
+        return changed
+
+    def remove(self, file:Path):
+        """Remove a note or asset; return the link keys whose target changed"""
+        self._links.cache_clear()
+        changed = set()
+        for key in self.keys.pop(file, ()):
+            candidates = self.candidates[key]
+            del candidates[file]
+            if self.files[key] != file:
+                continue
+            # The winner left: elect the best of the rest
+            if candidates:
+                winner, (_, _, url) = max(candidates.items(), key=lambda item: item[1])
+                self.urls[key], self.files[key] = url, winner
+            else:
+                del self.candidates[key], self.urls[key], self.files[key]
+            changed.add(key)
+        page = self.note_pages.pop(file, None)
+        if page is not None:
+            self.page_files[page].discard(file)
+            if not self.page_files[page]:
+                del self.page_files[page]
+        return changed
+
+    def url(self, target:str):
+        """Return the URL of a wikilink target relative to the site root, or None if nothing matches"""
+        return self.urls.get(link_key(target))
+
+    def note_url(self, target:str):
+        """Return the URL of the page a wikilink target resolves to, or None for assets and broken links"""
+        key = link_key(target)
+        return self.urls[key] if self.files.get(key) in self.note_pages else None
+
+    def note_file(self, target:str):
+        """Return the note a wikilink target resolves to, or None for assets and broken links"""
+        file = self.files.get(link_key(target))
+        return file if file in self.note_pages else None
+
+    def reserve(self, rel:str, name:str):
+        """Claim output path `rel` for the generated page `name`, so no note is published there"""
+        self.reserved[rel] = name
+
+    def publishes(self, file:Path) -> bool:
+        """Check if a note's page is written, i.e. no later note or generated page shares its output path"""
+        page = self.note_pages.get(file)
+        return page is not None and self.page_owner(page) == file
+
+    def page_owner(self, rel:str):
+        """Return the note file whose page is written to output path `rel`"""
+        files = self.page_files.get(rel)
+        return max(files, key=lambda file: file.parts) if files and rel not in self.reserved else None
+
+    def collisions(self):
+        """Return the output paths that more than one page maps to.
+
+        Entries are (output path, [note files], the generated page reserving
+        the path or None).
+        """
+        return sorted((rel, sorted(files, key=lambda file: file.parts), self.reserved.get(rel))
+                      for rel, files in self.page_files.items() if len(files) > 1 or rel in self.reserved)
+
+    def markdown_link(self, inner:str, embed:bool, depth:int):
+        """Return (markdown, target) for the inside of [[...]] on a page at `depth`"""
+        return self._links(inner, embed, depth)
+
+    def _markdown_link(self, inner, embed, depth):
+        target, *alias = inner.strip().split("|", 1)
+        name, _, heading = target.partition("#")
+        name = name.strip()
+        display = alias[0] if alias else target
+        note = self.note_file(name) if embed and name else None
+        if note is not None:
+            # Transcluded: the placeholder is filled in when the page is written
+            return embed_placeholder(note.relative_to(self.vault).as_posix(), heading.strip()), name
+        if name:
+            url = self.url(name)
+            # Only an asset is embedded as an image; a broken embed stays a plain link
+            image = embed and url is not None
+            if url is None:
+                # Broken: point where a note of that name would be published
+                url = slugify(name) + "/"
+            url = ("../" * depth + url) or "./"
+        else:
+            url, image = "", False  # [[#Heading]] links within the page
+        if heading:
+            url += "#" + slugify(heading.strip())
+        markdown = f"![{display}]({url})" if image else f"[{display}]({url})"
+        return markdown, name
+
+
+class LinkGraph:
+    """Which pages link to which.
+
+    `outgoing` is the adjacency list (note file → page URLs it links to) and
+    `incoming` its inverse (page URL → note files linking to it), so a page's
+    backlinks are a single lookup. Notes whose page another note with the
+    same slug overwrites are left out.
+    """
+
+    def __init__(self, index:LinkIndex):
+        self.index = index
+        self.nodes = {}     # note file → (page URL, title)
+        self.outgoing = {}  # note file → set of linked page URLs
+        self.incoming = {}  # page URL → set of note files linking to it
+
+    def set_note(self, file:Path, url:str, title:str, targets):
+        """Record a note and its wikilink targets; return the page URLs whose backlinks changed"""
+        urls = {self.index.note_url(target) for target in targets} - {None, url}
+        old_node, old_urls = self.nodes.get(file), self.outgoing.get(file, set())
+        self._unlink(file, old_urls - urls)
+        for target in urls - old_urls:
+            self.incoming.setdefault(target, set()).add(file)
+        self.nodes[file] = (url, title)
+        self.outgoing[file] = urls
+        # A new title or URL shows up on every page the note links to
+        return old_urls | urls if old_node != (url, title) else old_urls ^ urls
+
+    def remove(self, file:Path):
+        """Forget a note; return the page URLs whose backlinks changed"""
+        self.nodes.pop(file, None)
+        old_urls = self.outgoing.pop(file, set())
+        self._unlink(file, old_urls)
+        return old_urls
+
+    def _unlink(self, file, urls):
+        for target in urls:
+            self.incoming[target].discard(file)
+            if not self.incoming[target]:
+                del self.incoming[target]
+
+    def backlinks(self, url:str):
+        """Return sorted (title, URL) pairs for the pages linking to the page at `url`"""
+        return sorted(self.nodes[file][::-1] for file in self.incoming.get(url, ()) if self.index.publishes(file))
+
+    def to_json(self) -> str:
+        """Return the graph as {"nodes": [[url, title], ...], "edges": [[source, target], ...]}.
+
+        Edges refer to nodes by position; both lists are sorted, so the same
+        vault always gives the same file.
+        """
+        published = [file for file in self.nodes if self.index.publishes(file)]
+        nodes = sorted(self.nodes[file] for file in published)
+        position = {url: i for i, (url, title) in enumerate(nodes)}
+        edges = sorted({(position[self.nodes[file][0]], position[target])
+                        for file in published for target in self.outgoing[file] if target in position})
+        return json.dumps({"nodes": nodes, "edges": edges}, ensure_ascii=False, separators=(",", ":"))
+
+
+def backlinks_html(backlinks, depth:int) -> str:
+    """Return the "Linked mentions" section for a page at `depth`, or "" if nothing links to it"""
+    if not backlinks:
+        return ""
+    prefix = "../" * depth
+    items = "\n".join(f"<li><a href='{(prefix + url) or './'}'>{title}</a></li>" for title, url in backlinks)
+    return f"\n<section class='backlinks'>\n<h2>Linked mentions</h2>\n<ul>\n{items}\n</ul>\n</section>"
+
+
+def broken_links(links, index:LinkIndex):
+    """Return sorted (note file, target) pairs for wikilinks that resolve to nothing.
+
+    `links` maps each note file to the targets preprocess collected from it.
+    """
+    return sorted({(file, target) for file, targets in links.items() for target in targets
+                   if index.url(target) is None}, key=lambda pair: (pair[0].parts, pair[1]))
+
+
+def link_report(vault:Path, broken, collisions):
+    """Return the lines of the --check-links report"""
+    lines = [f"✗ Broken link in {file.relative_to(vault).as_posix()}: [[{target}]]" for file, target in broken]
+    for rel, files, generated in collisions:
+        sources = ", ".join(file.relative_to(vault).as_posix() for file in files)
+        if generated:
+            lines.append(f"✗ Slug collision: {rel} is the {generated}, so {sources} is not published (rename the note)")
+        else:
+            lines.append(f"✗ Slug collision: {rel} is written by {sources} (the last one wins)")
+    return lines